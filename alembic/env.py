@@ -4,7 +4,7 @@ from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
-from app.models import users, books, authors, categories, borrowed_books
+from app.models import users, books, authors, categories, borrowed_books, stats, fines
 from sqlmodel import SQLModel
 
 from dotenv import load_dotenv
@@ -0,0 +1,39 @@
+"""add book borrow daily buckets
+
+Revision ID: 3f8a1c6d2e95
+Revises: e4b7d29c8a61
+Create Date: 2026-10-18 16:20:44.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a1c6d2e95'
+down_revision: Union[str, None] = 'e4b7d29c8a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_borrow_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('borrow_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'book_id')
+    )
+    op.execute("""
+        INSERT INTO book_borrow_daily (day, book_id, borrow_count)
+        SELECT date(borrowed_date), book_id, count(*)
+        FROM borrowed_book
+        GROUP BY date(borrowed_date), book_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('book_borrow_daily')
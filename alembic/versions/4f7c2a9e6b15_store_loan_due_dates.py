@@ -0,0 +1,51 @@
+"""store loan due dates
+
+Revision ID: 4f7c2a9e6b15
+Revises: 6e1b9d3f4a28
+Create Date: 2026-10-18 23:58:04.117362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7c2a9e6b15'
+down_revision: Union[str, None] = '6e1b9d3f4a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Loans borrowed without an agreed date were due BORROW_DURATION_DAYS
+    # later, new loans store that date when they are created
+    op.execute(
+        sa.text(
+            "UPDATE borrowed_book SET return_date = borrowed_date + make_interval(days => :days) "
+            "WHERE return_date IS NULL"
+        ).bindparams(days=get_settings().BORROW_DURATION_DAYS)
+    )
+    with op.get_context().autocommit_block():
+        # Replaces an expression index that had the loan period built in
+        op.drop_index(
+            'ix_borrowed_book_open_due_date', table_name='borrowed_book',
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.create_index(
+            'ix_borrowed_book_open_due_date', 'borrowed_book', ['return_date', 'id'],
+            postgresql_where=sa.text('real_return_date IS NULL'),
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    # The backfilled return dates stay, they are the loans' due dates
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_borrowed_book_open_due_date', table_name='borrowed_book',
+            postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,44 @@
+"""add book search vector
+
+Revision ID: 5b2f8c1d7e40
+Revises: 890cb55f898f
+Create Date: 2026-10-18 09:12:41.502318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2f8c1d7e40'
+down_revision: Union[str, None] = '890cb55f898f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.create_index('ix_book_search_vector', 'book', ['search_vector'], unique=False, postgresql_using='gin')
+    # Backfill existing rows, new writes are kept in sync by CRUDBook.refresh_search_vector
+    op.execute("""
+        UPDATE book SET search_vector =
+            setweight(to_tsvector('simple', coalesce(book.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(author.first_name || ' ' || author.last_name, ' ')
+                FROM author JOIN book_author_link ON book_author_link.author_id = author.id
+                WHERE book_author_link.book_id = book.id
+            ), '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(category.name, ' ')
+                FROM category JOIN book_category_link ON book_category_link.category_id = category.id
+                WHERE book_category_link.book_id = book.id
+            ), '')), 'C')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_search_vector', table_name='book', postgresql_using='gin')
+    op.drop_column('book', 'search_vector')
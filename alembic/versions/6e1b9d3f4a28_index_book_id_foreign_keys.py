@@ -0,0 +1,61 @@
+"""index book_id foreign keys and link table reverse keys
+
+Revision ID: 6e1b9d3f4a28
+Revises: d8c4f1a7b392
+Create Date: 2026-10-18 22:47:19.351842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1b9d3f4a28'
+down_revision: Union[str, None] = 'd8c4f1a7b392'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Deleting a book cascades into both tables, without these indexes
+    # every deleted book scanned them in full
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_book_borrow_daily_book_id'), 'book_borrow_daily', ['book_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            op.f('ix_fine_book_id'), 'fine', ['book_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        # The link tables' primary keys lead with book_id, filtering books
+        # by author or category scanned them in full
+        op.create_index(
+            'ix_book_author_link_author_id', 'book_author_link', ['author_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_book_category_link_category_id', 'book_category_link', ['category_id'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_book_category_link_category_id', table_name='book_category_link',
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            'ix_book_author_link_author_id', table_name='book_author_link',
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            op.f('ix_fine_book_id'), table_name='fine', postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            op.f('ix_book_borrow_daily_book_id'), table_name='book_borrow_daily',
+            postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,36 @@
+"""add user active borrow count
+
+Revision ID: 7b2e5f9a4c13
+Revises: 3f8a1c6d2e95
+Create Date: 2026-10-18 17:08:51.226407
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e5f9a4c13'
+down_revision: Union[str, None] = '3f8a1c6d2e95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('active_borrow_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE "user" SET active_borrow_count = open_loans.total
+        FROM (
+            SELECT user_id, count(*) AS total
+            FROM borrowed_book
+            WHERE real_return_date IS NULL
+            GROUP BY user_id
+        ) AS open_loans
+        WHERE open_loans.user_id = "user".id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'active_borrow_count')
@@ -0,0 +1,37 @@
+"""add trigram indexes
+
+Revision ID: 9d4e1a6b3c27
+Revises: 5b2f8c1d7e40
+Create Date: 2026-10-18 11:40:05.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e1a6b3c27'
+down_revision: Union[str, None] = '5b2f8c1d7e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'ix_book_title_trgm', 'book', ['title'],
+        postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}
+    )
+    # Must match AUTHOR_FULL_NAME in app/services/suggest.py to be used
+    op.create_index(
+        'ix_author_full_name_trgm', 'author',
+        [sa.text("(first_name || ' ' || last_name) gin_trgm_ops")],
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_author_full_name_trgm', table_name='author')
+    op.drop_index('ix_book_title_trgm', table_name='book')
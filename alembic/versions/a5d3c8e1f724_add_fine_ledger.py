@@ -0,0 +1,43 @@
+"""add fine ledger
+
+Revision ID: a5d3c8e1f724
+Revises: 7b2e5f9a4c13
+Create Date: 2026-10-18 18:31:02.774519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d3c8e1f724'
+down_revision: Union[str, None] = '7b2e5f9a4c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'fine',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('borrowed_book_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('due_date', sa.DateTime(), nullable=False),
+        sa.Column('days_overdue', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('assessed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['borrowed_book_id'], ['borrowed_book.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('borrowed_book_id')
+    )
+    op.create_index(op.f('ix_fine_user_id'), 'fine', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_fine_user_id'), table_name='fine')
+    op.drop_table('fine')
@@ -0,0 +1,36 @@
+"""add book active borrow count
+
+Revision ID: c71a9e2f5b18
+Revises: 9d4e1a6b3c27
+Create Date: 2026-10-18 13:05:27.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71a9e2f5b18'
+down_revision: Union[str, None] = '9d4e1a6b3c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('book', sa.Column('active_borrow_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE book SET active_borrow_count = open_loans.total
+        FROM (
+            SELECT book_id, count(*) AS total
+            FROM borrowed_book
+            WHERE real_return_date IS NULL
+            GROUP BY book_id
+        ) AS open_loans
+        WHERE open_loans.book_id = book.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('book', 'active_borrow_count')
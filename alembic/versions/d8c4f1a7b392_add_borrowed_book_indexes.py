@@ -0,0 +1,44 @@
+"""add borrowed book indexes
+
+Revision ID: d8c4f1a7b392
+Revises: a5d3c8e1f724
+Create Date: 2026-10-18 21:12:37.604918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8c4f1a7b392'
+down_revision: Union[str, None] = 'a5d3c8e1f724'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps borrowed_book writable while the indexes build,
+    # it cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_borrowed_book_book_id_real_return_date', 'borrowed_book', ['book_id', 'real_return_date'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+        op.create_index(
+            'ix_borrowed_book_user_id_borrowed_date', 'borrowed_book', ['user_id', 'borrowed_date'],
+            postgresql_concurrently=True, if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_borrowed_book_user_id_borrowed_date', table_name='borrowed_book',
+            postgresql_concurrently=True, if_exists=True
+        )
+        op.drop_index(
+            'ix_borrowed_book_book_id_real_return_date', table_name='borrowed_book',
+            postgresql_concurrently=True, if_exists=True
+        )
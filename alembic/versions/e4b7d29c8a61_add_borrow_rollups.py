@@ -0,0 +1,74 @@
+"""add borrow rollups
+
+Revision ID: e4b7d29c8a61
+Revises: c71a9e2f5b18
+Create Date: 2026-10-18 15:42:10.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7d29c8a61'
+down_revision: Union[str, None] = 'c71a9e2f5b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_borrow_stats',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('borrow_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['book.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id')
+    )
+    op.create_index(op.f('ix_book_borrow_stats_borrow_count'), 'book_borrow_stats', ['borrow_count'], unique=False)
+    op.create_table(
+        'author_borrow_stats',
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('borrow_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['author_id'], ['author.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('author_id')
+    )
+    op.create_index(op.f('ix_author_borrow_stats_borrow_count'), 'author_borrow_stats', ['borrow_count'], unique=False)
+    op.create_table(
+        'category_borrow_stats',
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('borrow_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['category_id'], ['category.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('category_id')
+    )
+    op.create_index(op.f('ix_category_borrow_stats_borrow_count'), 'category_borrow_stats', ['borrow_count'], unique=False)
+
+    # Backfill from the existing borrow history
+    op.execute("""
+        INSERT INTO book_borrow_stats (book_id, borrow_count)
+        SELECT book_id, count(*) FROM borrowed_book GROUP BY book_id
+    """)
+    op.execute("""
+        INSERT INTO author_borrow_stats (author_id, borrow_count)
+        SELECT link.author_id, sum(stats.borrow_count)
+        FROM book_author_link AS link
+        JOIN book_borrow_stats AS stats ON stats.book_id = link.book_id
+        GROUP BY link.author_id
+    """)
+    op.execute("""
+        INSERT INTO category_borrow_stats (category_id, borrow_count)
+        SELECT link.category_id, sum(stats.borrow_count)
+        FROM book_category_link AS link
+        JOIN book_borrow_stats AS stats ON stats.book_id = link.book_id
+        GROUP BY link.category_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_category_borrow_stats_borrow_count'), table_name='category_borrow_stats')
+    op.drop_table('category_borrow_stats')
+    op.drop_index(op.f('ix_author_borrow_stats_borrow_count'), table_name='author_borrow_stats')
+    op.drop_table('author_borrow_stats')
+    op.drop_index(op.f('ix_book_borrow_stats_borrow_count'), table_name='book_borrow_stats')
+    op.drop_table('book_borrow_stats')
@@ -1,10 +1,12 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.database import get_session
+from app.db.database import get_async_session, get_session
 from app.models.authors import AuthorCreate, AuthorRead, AuthorUpdate
-from app.crud.authors import crud_authors
+from app.crud.authors import async_crud_authors, crud_authors
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter()
 
@@ -18,22 +20,26 @@ def create_author(
 
 
 @router.get("/", response_model=List[AuthorRead])
-def read_authors(
+async def read_authors(
         *,
-        db: Session = Depends(get_session),
+        db: AsyncSession = Depends(get_async_session),
+        response: Response,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ):
-    return crud_authors.get_multi(db=db, skip=skip, limit=limit)
+    authors = await async_crud_authors.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, authors, limit)
+    return authors
 
 
 @router.get("/{author_id}", response_model=AuthorRead)
-def read_author(
+async def read_author(
         *,
         author_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    author = crud_authors.get(db=db, id=author_id)
+    author = await async_crud_authors.get(db=db, id=author_id)
     if not author:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -73,7 +79,7 @@ def delete_author(
         )
 
     # Check if author has books
-    if author.books:
+    if crud_authors.has_related(db, author_id, "books"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Cannot delete author with ID {author_id} because they have associated books"
@@ -1,67 +1,150 @@
 # app/api/books.py
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from typing import List, Optional, Set
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlmodel import Session
-
-from app.db.database import get_session
-from app.models.books import BookCreate, BookRead, BookUpdate, BookService
-from app.crud.books import crud_books
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.database import get_async_session, get_session
+from app.models.books import (
+    BookAvailability, BookAvailabilityRequest, BookCreate, BookImportReport, BookRead,
+    BookSearchResult, BookUpdate
+)
+from app.models.books_expanded import BookReadWithRelations
+from app.models.borrowed_books import BorrowedBook
+from app.crud.books import EXPANDABLE_RELATIONS, async_crud_books, crud_books
+from app.services.book_import import detect_format, import_books
+from app.utils.pagination import set_next_cursor
 # from app.services.book_service import BookService
 
 router = APIRouter()
 # book_service = BookService()
 
 
+def parse_expand(expand: Optional[str]) -> Set[str]:
+    if not expand:
+        return set()
+    requested = {name.strip() for name in expand.split(",") if name.strip()}
+    unknown = requested - EXPANDABLE_RELATIONS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot expand {', '.join(sorted(unknown))}, "
+                   f"allowed: {', '.join(sorted(EXPANDABLE_RELATIONS))}"
+        )
+    return requested
+
+
+def to_book_read(book, expand: Set[str]) -> BookReadWithRelations:
+    data = BookRead.model_validate(book).model_dump()
+    for name in expand:
+        data[name] = getattr(book, name)
+    return BookReadWithRelations(**data)
+
+
 @router.post("/", response_model=BookRead, status_code=status.HTTP_201_CREATED)
 def create_book(
         book: BookCreate,
         db: Session = Depends(get_session)
 ):
     # Check if a book with the same ISBN already exists
-    existing_books = crud_books.search_books(db, title=None, author_id=None)
-    for existing_book in existing_books:
-        if existing_book.isbn == book.isbn:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Book with ISBN {book.isbn} already exists"
-            )
+    if crud_books.exists_isbn(db, book.isbn):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Book with ISBN {book.isbn} already exists"
+        )
 
     return crud_books.create_with_relations(db=db, obj_in=book)
 
 
-@router.get("/", response_model=List[BookRead])
-def read_books(
+@router.post("/import", response_model=BookImportReport)
+def import_books_feed(
         *,
-        db: Session = Depends(get_session),
+        file: UploadFile = File(...),
+        format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+        chunk_size: int = Query(1000, ge=1, le=10000),
+        db: Session = Depends(get_session)
+):
+    fmt = format or detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot detect the feed format, pass format=csv or format=ndjson"
+        )
+
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return import_books(db, stream, fmt, chunk_size=chunk_size)
+    finally:
+        stream.detach()
+
+
+@router.post("/availability", response_model=List[BookAvailability])
+async def check_books_availability(
+        request: BookAvailabilityRequest,
+        db: AsyncSession = Depends(get_async_session)
+):
+    return await async_crud_books.get_availability_many(db=db, book_ids=request.book_ids)
+
+
+@router.get("/", response_model=List[BookReadWithRelations], response_model_exclude_unset=True)
+async def read_books(
+        *,
+        db: AsyncSession = Depends(get_async_session),
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         title: Optional[str] = None,
         author_id: Optional[int] = None,
-        category_id: Optional[int] = None
+        category_id: Optional[int] = None,
+        expand: Optional[str] = Query(None, description="Comma separated: authors,categories")
 ):
-    return crud_books.search_books(
+    relations = parse_expand(expand)
+    books = await async_crud_books.search_books(
         db=db,
         title=title,
         author_id=author_id,
         category_id=category_id,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=cursor,
+        expand=relations
     )
+    set_next_cursor(response, books, limit)
+    return [to_book_read(book, relations) for book in books]
 
 
-@router.get("/{book_id}", response_model=BookRead)
-def read_book(
+@router.get("/search", response_model=List[BookSearchResult])
+async def search_books(
+        *,
+        db: AsyncSession = Depends(get_async_session),
+        q: str = Query(..., min_length=1),
+        skip: int = 0,
+        limit: int = 20
+):
+    results = await async_crud_books.search_fulltext(db=db, q=q, skip=skip, limit=limit)
+    return [
+        BookSearchResult(**BookRead.model_validate(book).model_dump(), rank=rank)
+        for book, rank in results
+    ]
+
+
+@router.get("/{book_id}", response_model=BookReadWithRelations, response_model_exclude_unset=True)
+async def read_book(
         *,
         book_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session),
+        expand: Optional[str] = Query(None, description="Comma separated: authors,categories")
 ):
-    book = crud_books.get(db=db, id=book_id)
+    relations = parse_expand(expand)
+    book = await async_crud_books.get_with_relations(db=db, id=book_id, expand=relations)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found"
         )
-    return book
+    return to_book_read(book, relations)
 
 
 @router.put("/{book_id}", response_model=BookRead)
@@ -80,13 +163,11 @@ def update_book(
 
     # Check ISBN uniqueness if it's being updated
     if book.isbn and book.isbn != db_book.isbn:
-        existing_books = crud_books.search_books(db, title=None, author_id=None, category_id=None)
-        for existing_book in existing_books:
-            if existing_book.isbn == book.isbn:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Book with ISBN {book.isbn} already exists"
-                )
+        if crud_books.exists_isbn(db, book.isbn, exclude_id=book_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Book with ISBN {book.isbn} already exists"
+            )
 
     return crud_books.update_with_relations(db=db, db_obj=db_book, obj_in=book)
 
@@ -98,7 +179,6 @@ def delete_book(
         db: Session = Depends(get_session)
 ):
     book = crud_books.get(db=db, id=book_id)
-    book_service = BookService()
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -106,8 +186,7 @@ def delete_book(
         )
 
     # Check if the book has active borrows
-    
-    if book_service.has_active_borrows(db=db, book_id=book_id):
+    if crud_books.has_related(db, book_id, "borrowed_books", BorrowedBook.real_return_date == None):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Cannot delete book with ID {book_id} because it has active borrows"
@@ -117,24 +196,17 @@ def delete_book(
 
 
 @router.get("/{book_id}/available", response_model=dict)
-def check_book_availability(
+async def check_book_availability(
         *,
         book_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    book = crud_books.get(db=db, id=book_id)
-    book_service = BookService()
-    if not book:
+    # Live counters, the entity cache only sees borrows made by this worker
+    availability = await async_crud_books.get_availability_many(db, [book_id])
+    if not availability:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found"
         )
 
-    available_copies = book_service.get_available_copies(db=db, book_id=book_id)
-
-    return {
-        "book_id": book_id,
-        "total_copies": book.quantity,
-        "available_copies": available_copies,
-        "is_available": available_copies > 0
-    }
+    return availability[0].model_dump()
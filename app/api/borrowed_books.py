@@ -1,11 +1,12 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Response, status
 from sqlmodel import Session
 from app.db.database import get_session
 from app.models.borrowed_books import BorrowedBookCreate, BorrowedBookRead, BorrowedBookUpdate
 from app.crud.borrowed_books import crud_borrowed
-from app.crud.users import crud_users   
-from app.crud.books import crud_books
+from app.models.fines import OverdueLoan, UserFineTotal
+from app.services import fines
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter()
 
@@ -14,47 +15,73 @@ def create_borrowed(
     borrowed: BorrowedBookCreate,
     db: Session = Depends(get_session)
 ):
-    # Перевірка існування user
-    user = crud_users.get(db, borrowed.user_id)
-    if not user:
-        raise HTTPException(status_code=400, detail="User not found")
-    # Перевірка існування book
-    book = crud_books.get(db, borrowed.book_id)
-    if not book:
-        raise HTTPException(status_code=400, detail="Book not found")
+    # Reserves a copy and a slot of the user's limit atomically, unknown
+    # users/books and exhausted limits surface as LibraryException
     return crud_borrowed.create(db=db, obj_in=borrowed)
 
 @router.get("/", response_model=List[BorrowedBookRead])
 def read_borrowed(
         *,
         db: Session = Depends(get_session),
+        response: Response,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         user_id: Optional[int] = Query(None, alias="user_id"),
         book_id: Optional[int] = Query(None, alias="book_id")
 ):
-    return crud_borrowed.get_multi(
+    borrowed_books = crud_borrowed.get_multi(
         db=db,
         skip=skip,
         limit=limit,
+        cursor=cursor,
         user_id=user_id,
         book_id=book_id
     )
+    set_next_cursor(response, borrowed_books, limit)
+    return borrowed_books
    
+@router.get("/overdue", response_model=List[OverdueLoan])
+def read_overdue(
+        *,
+        db: Session = Depends(get_session),
+        response: Response,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        user_id: Optional[int] = None
+):
+    overdue = fines.get_overdue(db, skip=skip, limit=limit, cursor=cursor, user_id=user_id)
+    set_next_cursor(response, overdue, limit, fines.overdue_cursor_key)
+    return overdue
+
+@router.get("/fines", response_model=List[UserFineTotal])
+def read_fine_totals(
+        *,
+        db: Session = Depends(get_session),
+        limit: int = 100,
+        user_id: Optional[int] = None
+):
+    # Totals from the ledger written by the nightly fines job
+    return fines.get_fine_totals(db, limit=limit, user_id=user_id)
+
 @router.get("/{user_id}", response_model=List[BorrowedBookRead])
 def read_borrowed_by_user(
         *,
         user_id: int,
         db: Session = Depends(get_session),
+        response: Response,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ):
-    borrowed_books = crud_borrowed.get_by_user(db=db, user_id=user_id, skip=skip, limit=limit)
+    borrowed_books = crud_borrowed.get_by_user(db=db, user_id=user_id, skip=skip, limit=limit, cursor=cursor)
     if not borrowed_books:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No borrowed books found for user with ID {user_id}"
         )
+    set_next_cursor(response, borrowed_books, limit)
     return borrowed_books
 
 @router.put("/{borrowed_id}", response_model=BorrowedBookRead)
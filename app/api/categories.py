@@ -1,10 +1,12 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.categories import Category
-from app.db.database import get_session
+from app.db.database import get_async_session, get_session
 from app.models.categories import CategoryCreate, CategoryRead, CategoryUpdate
-from app.crud.categories import crud_categories
+from app.crud.categories import async_crud_categories, crud_categories
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter()
 
@@ -19,21 +21,25 @@ def create_category(
     return crud_categories.create(db=db, obj_in=category)
 
 @router.get("/", response_model=List[CategoryRead])
-def read_categories(
+async def read_categories(
         *,
-        db: Session = Depends(get_session),
+        db: AsyncSession = Depends(get_async_session),
+        response: Response,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ):
-    return crud_categories.get_multi(db=db, skip=skip, limit=limit)
+    categories = await async_crud_categories.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, categories, limit)
+    return categories
 
 @router.get("/{category_id}", response_model=CategoryRead)
-def read_category(
+async def read_category(
         *,
         category_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    category = crud_categories.get(db=db, id=category_id)
+    category = await async_crud_categories.get(db=db, id=category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -42,12 +48,12 @@ def read_category(
     return category
 
 @router.get("/name/{name}", response_model=CategoryRead)
-def read_category_by_name(
+async def read_category_by_name(
         *,
         name: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    category = crud_categories.get_by_name(db=db, name=name)
+    category = await async_crud_categories.get_by_name(db=db, name=name)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -81,7 +87,7 @@ def delete_category(
             detail=f"Category with ID {category_id} not found"
         )
 
-    if category.books:
+    if crud_categories.has_related(db, category_id, "books"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Cannot delete category with ID {category_id} because it has associated books"
@@ -0,0 +1,25 @@
+# app/api/export.py
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from app.db.database import get_session
+from app.services.export import export_headers, export_stream, media_type
+
+router = APIRouter()
+
+
+@router.get("/{kind}")
+def export(
+        kind: Literal["books", "authors", "borrowed_books"],
+        format: Literal["csv", "ndjson"] = "csv",
+        gzip: bool = Query(False, description="Send a gzip-compressed file"),
+        # The session must outlive the endpoint, the body is read while streaming
+        db: Session = Depends(get_session, scope="request")
+):
+    return StreamingResponse(
+        export_stream(db, kind, format, gzip=gzip),
+        media_type=media_type(format, gzip=gzip),
+        headers=export_headers(kind, format, gzip=gzip),
+    )
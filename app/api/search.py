@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session
+
+from app.db.database import get_session
+from app.models.search import SuggestResults
+from app.services.suggest import suggest
+
+router = APIRouter()
+
+
+@router.get("/suggest", response_model=SuggestResults)
+def suggest_titles_and_authors(
+        *,
+        db: Session = Depends(get_session),
+        q: str = Query(..., min_length=2),
+        limit: int = Query(10, ge=1, le=50)
+):
+    return suggest(db, q, limit=limit)
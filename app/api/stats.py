@@ -1,56 +1,91 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session,func
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlmodel import Session
 from app.db.database import get_session
-from app.models.books import Book, BookAuthorLink, BookCategoryLink
-from app.models.borrowed_books import BorrowedBook 
-from app.models.authors import Author
-from app.models.categories import Category 
+from app.services import popularity
+from app.crud.cache import cache_stats, entity_cache
+from app.auth import password_hasher
+from app.db.pool import pool_metrics
+from app.utils.logger import logging_stats
 
 router = APIRouter()
 
+WINDOW_DAYS = {"7d": 7, "30d": 30, "365d": 365}
+
+
+def borrow_window(
+        window: Optional[str] = Query(None, pattern="^(7d|30d|365d)$"),
+        from_date: Optional[date] = Query(None, alias="from"),
+        to_date: Optional[date] = Query(None, alias="to"),
+) -> Optional[Tuple[date, date]]:
+    # No window and no dates: all-time counts from the rollups
+    if window is None and from_date is None and to_date is None:
+        return None
+    if window is not None and (from_date is not None or to_date is not None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either window or from/to, not both"
+        )
+    today = datetime.now(timezone.utc).date()
+    if window is not None:
+        return today - timedelta(days=WINDOW_DAYS[window] - 1), today
+    start, end = from_date or date.min, to_date or today
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="from must not be after to"
+        )
+    return start, end
+
+@router.get("/cache")
+def get_cache_stats():
+    return {
+        "backend": entity_cache.info() if entity_cache is not None else None,
+        "entities": {name: stats.as_dict() for name, stats in cache_stats.items()}
+    }
+
+@router.get("/pool")
+def get_pool_stats():
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+@router.get("/logging")
+def get_logging_stats():
+    return logging_stats()
+
+@router.get("/password-hashing")
+def get_password_hashing_stats():
+    return password_hasher.stats()
+
 @router.get("/popular-books")
-def get_popular_books(limit: int = 5, session: Session = Depends(get_session)):
-    result = (
-        session.query(Book, func.count(BorrowedBook.id).label("borrow_count"))
-        .join(BorrowedBook, BorrowedBook.book_id == Book.id)
-        .group_by(Book.id)
-        .order_by(func.count(BorrowedBook.id).desc())
-        .limit(limit)
-        .all()
-    )
+def get_popular_books(
+        limit: int = 5,
+        window: Optional[Tuple[date, date]] = Depends(borrow_window),
+        session: Session = Depends(get_session)
+):
     return [
-        {"book": book.title, "borrow_count": borrow_count}
-        for book, borrow_count in result
+        {"book": title, "borrow_count": borrow_count}
+        for title, borrow_count in popularity.top_books(session, limit, window)
     ]
 
 @router.get("/popular-authors")
-def get_popular_authors(limit: int = 5, session: Session = Depends(get_session)):
-    result = (
-        session.query(Author, func.count(BorrowedBook.id).label("borrow_count"))
-        .join(BookAuthorLink, BookAuthorLink.author_id == Author.id)
-        .join(BorrowedBook, BorrowedBook.book_id == BookAuthorLink.book_id)
-        .group_by(Author.id)
-        .order_by(func.count(BorrowedBook.id).desc())
-        .limit(limit)
-        .all()
-    )
+def get_popular_authors(
+        limit: int = 5,
+        window: Optional[Tuple[date, date]] = Depends(borrow_window),
+        session: Session = Depends(get_session)
+):
     return [
-        {"author": f"{author.first_name} {author.last_name}", "borrow_count": borrow_count}
-        for author, borrow_count in result
+        {"author": f"{first_name} {last_name}", "borrow_count": borrow_count}
+        for first_name, last_name, borrow_count in popularity.top_authors(session, limit, window)
     ]
 
 @router.get("/popular-categories")
-def get_popular_categories(limit: int = 5, session: Session = Depends(get_session)):
-    result = (
-        session.query(Category, func.count(BorrowedBook.id).label("borrow_count"))
-        .join(BookCategoryLink, BookCategoryLink.category_id == Category.id)
-        .join(BorrowedBook, BorrowedBook.book_id == BookCategoryLink.book_id)
-        .group_by(Category.id)
-        .order_by(func.count(BorrowedBook.id).desc())
-        .limit(limit)
-        .all()
-    )
+def get_popular_categories(
+        limit: int = 5,
+        window: Optional[Tuple[date, date]] = Depends(borrow_window),
+        session: Session = Depends(get_session)
+):
     return [
-        {"category": category.name, "borrow_count": borrow_count}
-        for category, borrow_count in result
-    ]
\ No newline at end of file
+        {"category": name, "borrow_count": borrow_count}
+        for name, borrow_count in popularity.top_categories(session, limit, window)
+    ]
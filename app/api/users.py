@@ -1,11 +1,13 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.users import User
 from sqlalchemy.exc import IntegrityError
-from app.db.database import get_session
+from app.db.database import get_async_session, get_session
 from app.models.users import UserCreate, UserRead, UserUpdate
-from app.crud.users import crud_users
+from app.crud.users import async_crud_users, crud_users
+from app.utils.pagination import set_next_cursor
 from app.auth import authenticate_user, create_access_token, get_current_active_user, get_password_hash
 from app.config import get_settings
 from datetime import timedelta
@@ -15,25 +17,25 @@ router = APIRouter()
 settings = get_settings()
 
 @router.post("/", response_model=UserRead, status_code=201)
-def create_user(user: UserCreate, db: Session = Depends(get_session)):
-    existing = db.exec(select(User).where(User.email == user.email)).first()
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_session)):
+    existing = await async_crud_users.get_by_email(db, user.email)
     if existing:
         raise HTTPException(status_code=400, detail="User with this email already exists")
     try:
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await get_password_hash(user.password)
         user_data = user.dict(exclude={"password"})
         user_data["hashed_password"] = hashed_password
-        return crud_users.create(db=db, obj_in=user_data)
+        return await async_crud_users.create(db=db, obj_in=user_data)
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail="User with this email already exists")
     
 @router.post("/login", response_model=dict)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_session)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,30 +57,38 @@ async def read_own_items(current_user: User = Depends(get_current_active_user)):
     return [{"item_id": "Foo", "owner": current_user.email}]    
 
 @router.get("/", response_model=List[UserRead])
-def read_users(
+async def read_users(
         *,
-        db: Session = Depends(get_session),
+        db: AsyncSession = Depends(get_async_session),
+        response: Response,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ):
-    return crud_users.get_multi(db=db, skip=skip, limit=limit)
+    users = await async_crud_users.get_multi(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, users, limit)
+    return users
 
 @router.get("/active", response_model=List[UserRead])
-def read_active_users(
+async def read_active_users(
         *,
-        db: Session = Depends(get_session),
+        db: AsyncSession = Depends(get_async_session),
+        response: Response,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ):
-    return crud_users.get_active(db=db, skip=skip, limit=limit)
+    users = await async_crud_users.get_active(db=db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(response, users, limit)
+    return users
 
 @router.get("/{user_id}", response_model=UserRead)
-def read_user(
+async def read_user(
         *,
         user_id: int,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    user = crud_users.get(db=db, id=user_id)
+    user = await async_crud_users.get(db=db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -87,12 +97,12 @@ def read_user(
     return user
 
 @router.get("/email/{email}", response_model=UserRead)
-def read_user_by_email(
+async def read_user_by_email(
         *,
         email: str,
-        db: Session = Depends(get_session)
+        db: AsyncSession = Depends(get_async_session)
 ):
-    user = crud_users.get_by_email(db=db, email=email)
+    user = await async_crud_users.get_by_email(db=db, email=email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -130,7 +140,7 @@ def delete_user(
             detail=f"User with ID {user_id} not found"
         )
     # Перевірка на наявність BorrowedBook
-    if user.borrowed_books:
+    if crud_users.has_related(db, user_id, "borrowed_books"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User has borrowed books and cannot be deleted, please return them first"
@@ -1,8 +1,15 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.models.users import User, TokenData
 from app.config import get_settings
-from app.crud.users import crud_users
+from app.crud.users import async_crud_users, principal_cache
+from app.db.database import get_async_session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
@@ -13,19 +20,89 @@ SECRET_KEY = settings.SECRET_KEY
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+T = TypeVar("T")
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
 
-def authenticate_user(
-    db, email: str, password: str
+class PasswordHasher:
+    """Runs bcrypt on a dedicated thread pool instead of the event loop.
+
+    bcrypt releases the GIL, so max_workers hashes run in parallel while
+    other requests keep being served. At most max_queue calls wait for a
+    worker, further calls are rejected with 503 rather than queueing
+    without bound during a login burst.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_sum = 0.0
+        self.wait_ms_max = 0.0
+
+    def _timed(self, func: Callable[..., T], submitted_at: float, *args) -> T:
+        wait_ms = (time.perf_counter() - submitted_at) * 1000
+        with self._lock:
+            self.running += 1
+            self.wait_ms_sum += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent authentication requests",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._timed, func, time.perf_counter(), *args)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_ms_avg": round(self.wait_ms_sum / self.completed, 3) if self.completed else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 3),
+            }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.run(pwd_context.hash, password)
+
+async def authenticate_user(
+    db: AsyncSession, email: str, password: str
 ) -> User | None:
-    user = crud_users.get_by_email(db, email)
+    user = await async_crud_users.get_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password(password, user.hashed_password):
         return None
     return user
 
@@ -37,12 +114,14 @@ def create_access_token(
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_EXPIRATION_MINUTES)
-    to_encode.update({"exp": expire})
+    # iat lets principal_cache refuse tokens issued before a revocation
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(
-    db, token: str = Depends(oauth2_scheme)
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session)
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -57,9 +136,15 @@ async def get_current_user(
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = crud_users.get_by_email(db, email=token_data.email)
-    if user is None:
+    if principal_cache.is_revoked(token_data.email, payload.get("iat", 0)):
         raise credentials_exception
+    # Detached copy without hashed_password when served from the cache
+    user = principal_cache.get(token_data.email)
+    if user is None:
+        user = await async_crud_users.get_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        principal_cache.set(user)
     return user
 
 async def get_current_active_user(
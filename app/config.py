@@ -1,6 +1,7 @@
 # app.config.py
 import os
 import logging
+from typing import Optional
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -17,11 +18,47 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "info"
 
     MAX_BORROWS_PER_USER: int = 5
+    # Deadlock / serialization failure retries when reserving a copy
+    BORROW_MAX_RETRIES: int = 3
+    BORROW_RETRY_BACKOFF_MS: float = 20
     BORROW_DURATION_DAYS: int = 14
     OVERDUE_FINE_RATE: float = 0.5
 
     LOG_DIR: str = "logs"
+    # Records waiting for the log writer thread, extra records are dropped
+    LOG_QUEUE_SIZE: int = 10000
+
+    SUGGEST_INDEX_TTL_SECONDS: int = 300
+
+    # Rows fetched per round trip from the server-side cursor of an export
+    EXPORT_BATCH_SIZE: int = 5000
+
+    # memory: per-process LRU, shared: Redis at ENTITY_CACHE_URL (or a local
+    # in-memory stand-in when no URL is set), none: disabled. Only a shared
+    # backend with a URL sees invalidations made by other processes, such as
+    # the reconcile job or the other workers.
+    ENTITY_CACHE_BACKEND: str = "memory"
+    ENTITY_CACHE_URL: Optional[str] = None
+    ENTITY_CACHE_MAXSIZE: int = 10000
+    ENTITY_CACHE_TTL_SECONDS: int = 60
+    # Authenticated users by token subject, same backend as the entity cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+
+    # Per engine and per worker process, the async and sync engines each get one pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WAIT_WARN_MS: float = 100
+
+    # Statements slower than this go to slow_queries.log with their parameters
+    SLOW_QUERY_THRESHOLD_MS: float = 200
     
+    # bcrypt runs on this many threads, PASSWORD_HASH_MAX_QUEUE more calls may wait
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
     SECRET_KEY: str 
     JWT_ALGORITHM: str 
     JWT_EXPIRATION_MINUTES: int
@@ -1,5 +1,7 @@
 from app.models.authors import Author, AuthorCreate, AuthorUpdate
-from app.crud.base import CRUDBase
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.books import crud_books
+from app.crud.cache import entity_cache
 from datetime import datetime, timezone
 
 
@@ -12,10 +14,15 @@ class CRUDAuthor(CRUDBase[Author, AuthorCreate, AuthorUpdate]):
 
         db_obj.updated_at = datetime.now(timezone.utc)
         db.add(db_obj)
+        if "first_name" in update_data or "last_name" in update_data:
+            db.flush()
+            crud_books.refresh_search_vector(db, author_id=db_obj.id)
         db.commit()
+        self.invalidate(db_obj.id)
         db.refresh(db_obj)
 
         return db_obj
 
 
-crud_authors = CRUDAuthor(Author)
+crud_authors = CRUDAuthor(Author, cache=entity_cache)
+async_crud_authors = AsyncCRUDBase[Author, AuthorCreate, AuthorUpdate](crud_authors)
@@ -1,8 +1,14 @@
 # app/crud/base.py
-from typing import Generic, List, Optional, Type, TypeVar
+from typing import Generic, Iterable, List, Optional, Type, TypeVar
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from sqlalchemy import and_, inspect
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.crud.cache import CacheBackend, CacheStats, cache_stats
+from app.utils.pagination import paginate
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -10,16 +16,72 @@ UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelType]):
+    def __init__(
+            self, model: Type[ModelType], *, cache: Optional[CacheBackend] = None, cache_exclude: Iterable[str] = ()
+    ):
         self.model = model
+        self.cache = cache
+        # Columns never written to the cache (secrets), they stay unloaded on
+        # a cached instance and are fetched from the database on access
+        self.cache_exclude = frozenset(cache_exclude)
+        self.cache_stats = cache_stats.setdefault(model.__tablename__, CacheStats()) \
+            if cache is not None else CacheStats()
+
+    def _cache_key(self, id: int) -> str:
+        return f"{self.model.__tablename__}:{id}"
+
+    def invalidate(self, id: int) -> None:
+        if self.cache is not None:
+            self.cache.delete(self._cache_key(id))
+            self.cache_stats.invalidations += 1
+
+    def _cached(self, id: int) -> Optional[ModelType]:
+        data = self.cache.get(self._cache_key(id))
+        if data is None:
+            self.cache_stats.misses += 1
+            return None
+        self.cache_stats.hits += 1
+        # Detached instance, merged with load=False it becomes a clean
+        # persistent object without a SELECT, so update/remove keep working
+        obj = self.model(**data)
+        make_transient_to_detached(obj)
+        return obj
+
+    def _store(self, obj: Optional[ModelType], generation: int) -> None:
+        # Skipped by the backend when an invalidation ran since `generation`
+        # was read, the row loaded meanwhile may predate that write
+        if obj is not None:
+            columns = [attr.key for attr in inspect(self.model).column_attrs if attr.key not in self.cache_exclude]
+            self.cache.set(
+                self._cache_key(obj.id), {key: getattr(obj, key) for key in columns}, generation=generation
+            )
 
     def get(self, db: Session, id: int) -> Optional[ModelType]:
-        return db.get(self.model, id)
+        if self.cache is None:
+            return db.get(self.model, id)
+
+        obj = self._cached(id)
+        if obj is not None:
+            return db.merge(obj, load=False)
+        generation = self.cache.generation()
+        obj = db.get(self.model, id)
+        self._store(obj, generation)
+        return obj
+
+    def has_related(self, db: Session, id: int, relationship: str, *criteria) -> bool:
+        """SELECT EXISTS over one of the model's relationships.
+
+        Guards such as "has borrowed books" stay a single indexed probe
+        instead of loading every related row to test its truthiness.
+        """
+        related = getattr(self.model, relationship)
+        statement = select(related.any(and_(*criteria) if criteria else None)).where(self.model.id == id)
+        return bool(db.exec(statement).first())
 
     def get_multi(
-            self, db: Session, *, skip: int = 0, limit: int = 100
+            self, db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
     ) -> List[ModelType]:
-        statement = select(self.model).offset(skip).limit(limit)
+        statement = paginate(select(self.model), self.model.id, skip=skip, limit=limit, cursor=cursor)
         results = db.exec(statement)
         return [item for item in results]
 
@@ -43,6 +105,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         db.add(db_obj)
         db.commit()
+        self.invalidate(db_obj.id)
         db.refresh(db_obj)
         return db_obj
 
@@ -50,4 +113,62 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj = db.get(self.model, id)
         db.delete(obj)
         db.commit()
-        return obj
\ No newline at end of file
+        self.invalidate(id)
+        return obj
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """AsyncSession counterpart of a CRUDBase, sharing its model and cache."""
+
+    def __init__(self, crud: CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
+        self.crud = crud
+        self.model = crud.model
+
+    async def get(self, db: AsyncSession, id: int) -> Optional[ModelType]:
+        if self.crud.cache is None:
+            return await db.get(self.model, id)
+
+        obj = self.crud._cached(id)
+        if obj is not None:
+            return await db.merge(obj, load=False)
+        generation = self.crud.cache.generation()
+        obj = await db.get(self.model, id)
+        self.crud._store(obj, generation)
+        return obj
+
+    async def get_multi(
+            self, db: AsyncSession, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[ModelType]:
+        statement = paginate(select(self.model), self.model.id, skip=skip, limit=limit, cursor=cursor)
+        results = await db.exec(statement)
+        return list(results.all())
+
+    async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        obj_in_data = jsonable_encoder(obj_in)
+        db_obj = self.model(**obj_in_data)
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update(
+            self, db: AsyncSession, *, db_obj: ModelType, obj_in: UpdateSchemaType
+    ) -> ModelType:
+        update_data = obj_in.model_dump(exclude_unset=True)
+
+        for field in inspect(self.model).column_attrs.keys():
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+
+        db.add(db_obj)
+        await db.commit()
+        self.crud.invalidate(db_obj.id)
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int) -> ModelType:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        await db.commit()
+        self.crud.invalidate(id)
+        return obj
@@ -1,16 +1,105 @@
-from typing import List, Optional
-from sqlmodel import Session, select
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
-from app.models.books import Book, BookCreate, BookUpdate, BookCategoryLink
+from app.models.books import Book, BookAvailability, BookCreate, BookService, BookUpdate, BookCategoryLink
 from app.models.authors import Author
 from app.models.categories import Category
 from app.models.books import BookAuthorLink
-from app.crud.base import CRUDBase
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.cache import entity_cache
+from app.services import popularity
 from app.utils.exceptions import LibraryException
+from app.utils.isbn_filter import ISBNFilter
+from app.utils.pagination import paginate
+
+# 'simple' keeps author names and non-English titles unstemmed
+SEARCH_CONFIG = "simple"
+
+EXPANDABLE_RELATIONS = {"authors": Book.authors, "categories": Book.categories}
+
+
+def _expand_options(expand: Iterable[str]) -> list:
+    # One extra "IN" query per relation for the whole page instead of one per row
+    return [selectinload(EXPANDABLE_RELATIONS[name]) for name in sorted(set(expand))]
+
+
+def _fulltext_statement(q: str, *, skip: int, limit: int):
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Book.search_vector, query)
+    return (
+        select(Book, rank.label("rank"))
+        .where(Book.search_vector.op("@@")(query))
+        .order_by(rank.desc(), Book.id)
+        .offset(skip)
+        .limit(limit)
+    )
+
+
+def _search_statement(
+        *,
+        title: Optional[str],
+        author_id: Optional[int],
+        category_id: Optional[int],
+        skip: int,
+        limit: int,
+        cursor: Optional[str],
+        expand: Iterable[str]
+):
+    query = select(Book).options(*_expand_options(expand))
+
+    if title:
+        query = query.where(Book.title.ilike(f"%{title}%"))
+
+    if author_id:
+        query = query.join(BookAuthorLink,
+                           Book.id == BookAuthorLink.book_id).where(BookAuthorLink.author_id == author_id)
+
+    if category_id:
+        query = query.join(BookCategoryLink).where(BookCategoryLink.category_id == category_id)
+
+    return paginate(query, Book.id, skip=skip, limit=limit, cursor=cursor)
 
 
 class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
+    def get_with_relations(
+            self, db: Session, id: int, *, expand: Iterable[str] = ()
+    ) -> Optional[Book]:
+        options = _expand_options(expand)
+        if not options:
+            return self.get(db, id)
+        return db.get(Book, id, options=options, populate_existing=True)
+
+    def get_by_isbn(self, db: Session, isbn: str) -> Optional[Book]:
+        statement = select(Book).where(Book.isbn == isbn)
+        return db.exec(statement).first()
+
+    def exists_isbn(
+            self, db: Session, isbn: str, *, exclude_id: Optional[int] = None
+    ) -> bool:
+        # Single probe on the unique ix_book_isbn index, no row is loaded
+        statement = select(Book.id).where(Book.isbn == isbn)
+        if exclude_id is not None:
+            statement = statement.where(Book.id != exclude_id)
+        return db.exec(statement.limit(1)).first() is not None
+
+    def existing_isbns(self, db: Session, isbns: Iterable[str]) -> Set[str]:
+        isbns = set(isbns)
+        if not isbns:
+            return set()
+        statement = select(Book.isbn).where(Book.isbn.in_(isbns))
+        return set(db.exec(statement).all())
+
+    def build_isbn_filter(self, db: Session, *, error_rate: float = 0.01) -> ISBNFilter:
+        total = db.exec(select(func.count(Book.id))).one()
+        isbn_filter = ISBNFilter(capacity=total * 2 + 1000, error_rate=error_rate)
+        statement = select(Book.isbn).execution_options(yield_per=10000)
+        isbn_filter.update(db.exec(statement))
+        return isbn_filter
+
     def create_with_relations(
             self, db: Session, *, obj_in: BookCreate
     ) -> Book:
@@ -24,13 +113,14 @@ class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
         db.add(book)
         db.flush()  # Flush to get book ID without committing
 
-        # Add author relationships
-        self._set_authors(db, book, obj_in.author_ids)
+        # Add author relationships, a new book has no links to diff against
+        self._set_authors(db, book, obj_in.author_ids, existing=set())
 
         # Add category relationships if category_ids exists in obj_in
         if hasattr(obj_in, 'category_ids'):
-            self._set_categories(db, book, obj_in.category_ids)
+            self._set_categories(db, book, obj_in.category_ids, existing=set())
 
+        self.refresh_search_vector(db, book_ids=[book.id])
         db.commit()
         db.refresh(book)
         return book
@@ -48,52 +138,121 @@ class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
         db_obj.updated_at = datetime.utcnow()
 
         # Update relationships if provided
-        if obj_in.author_ids is not None:
+        if "author_ids" in obj_in.model_fields_set:
             self._set_authors(db, db_obj, obj_in.author_ids)
 
-        if hasattr(obj_in, 'category_ids') and obj_in.category_ids is not None:
+        if "category_ids" in obj_in.model_fields_set:
             self._set_categories(db, db_obj, obj_in.category_ids)
 
         db.add(db_obj)
+        db.flush()
+        self.refresh_search_vector(db, book_ids=[db_obj.id])
         db.commit()
+        self.invalidate(db_obj.id)
         db.refresh(db_obj)
         return db_obj
 
-    def _set_authors(self, db: Session, book: Book, author_ids: List[int]) -> None:
-        # Clear existing relationships
-        statement = select(BookAuthorLink).where(BookAuthorLink.book_id == book.id)
-        existing_links = db.exec(statement).all()
-        for link in existing_links:
-            db.delete(link)
-        db.flush()
+    def remove(self, db: Session, *, id: int) -> Book:
+        # Its borrow history goes with the book, take it off the author/category rollups
+        popularity.forget_book(db, id)
+        return super().remove(db, id=id)
 
-        # Add new relationships
-        for author_id in author_ids:
-            # Check if author exists
-            author = db.get(Author, author_id)
-            if not author:
-                raise LibraryException(f"Author with ID {author_id} not found")
-
-            # Create new link
-            link = BookAuthorLink(book_id=book.id, author_id=author_id)
-            db.add(link)
-
-    def _set_categories(self, db: Session, book: Book, category_ids: List[int]) -> None:
-        # Clear existing category links
-        statement = select(BookCategoryLink).where(BookCategoryLink.book_id == book.id)
-        existing_links = db.exec(statement).all()
-        for link in existing_links:
-            db.delete(link)
-        db.flush()
+    def _set_authors(
+            self, db: Session, book: Book, author_ids: List[int], *, existing: Optional[Set[int]] = None
+    ) -> None:
+        self._sync_links(
+            db, book, BookAuthorLink, BookAuthorLink.author_id, Author, author_ids, existing
+        )
+
+    def _set_categories(
+            self, db: Session, book: Book, category_ids: List[int], *, existing: Optional[Set[int]] = None
+    ) -> None:
+        self._sync_links(
+            db, book, BookCategoryLink, BookCategoryLink.category_id, Category, category_ids, existing
+        )
+
+    def _sync_links(
+            self, db: Session, book: Book, link_model, link_column, target_model,
+            ids: List[int], existing: Optional[Set[int]] = None
+    ) -> None:
+        # Diff the requested ids against the stored links: one select, one
+        # IN validation, one bulk delete and one bulk insert at most
+        requested = set(ids)
+        if existing is None:
+            statement = select(link_column).where(link_model.book_id == book.id)
+            existing = set(db.exec(statement).all())
+        if requested == existing:
+            return
 
-        # Add new category links
-        for category_id in category_ids:
-            category = db.get(Category, category_id)
-            if not category:
-                raise LibraryException(f"Category with ID {category_id} not found")
-            link = BookCategoryLink(book_id=book.id, category_id=category_id)
-            db.add(link)
+        added = requested - existing
+        removed = existing - requested
 
+        if added:
+            found = set(db.exec(select(target_model.id).where(target_model.id.in_(added))).all())
+            missing = sorted(added - found)
+            if missing:
+                raise LibraryException(f"{target_model.__name__} with ID {missing[0]} not found")
+
+        # Borrows of the book wait on its counter row until the relink commits
+        popularity.lock_borrow_count(db, book.id)
+        if removed:
+            db.execute(
+                delete(link_model).where(link_model.book_id == book.id, link_column.in_(removed))
+            )
+        if added:
+            db.execute(
+                insert(link_model),
+                [{"book_id": book.id, link_column.key: target_id} for target_id in sorted(added)]
+            )
+        # Past borrows of the book follow it to its new authors/categories
+        popularity.move_link_counts(db, book.id, link_column, sorted(removed), -1)
+        popularity.move_link_counts(db, book.id, link_column, sorted(added), 1)
+
+    def _search_document(self):
+        author_names = (
+            select(func.string_agg(Author.first_name + " " + Author.last_name, " "))
+            .join(BookAuthorLink, BookAuthorLink.author_id == Author.id)
+            .where(BookAuthorLink.book_id == Book.id)
+            .scalar_subquery()
+        )
+        category_names = (
+            select(func.string_agg(Category.name, " "))
+            .join(BookCategoryLink, BookCategoryLink.category_id == Category.id)
+            .where(BookCategoryLink.book_id == Book.id)
+            .scalar_subquery()
+        )
+        weighted = [
+            func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, "")), weight)
+            for text, weight in ((Book.title, "A"), (author_names, "B"), (category_names, "C"))
+        ]
+        return weighted[0].op("||")(weighted[1]).op("||")(weighted[2])
+
+    def refresh_search_vector(
+            self,
+            db: Session,
+            *,
+            book_ids: Optional[Iterable[int]] = None,
+            author_id: Optional[int] = None,
+            category_id: Optional[int] = None
+    ) -> None:
+        # Recompute the stored tsvector in a single UPDATE for the affected books
+        statement = update(Book).values(search_vector=self._search_document())
+        if book_ids is not None:
+            statement = statement.where(Book.id.in_(list(book_ids)))
+        if author_id is not None:
+            statement = statement.where(Book.id.in_(
+                select(BookAuthorLink.book_id).where(BookAuthorLink.author_id == author_id)
+            ))
+        if category_id is not None:
+            statement = statement.where(Book.id.in_(
+                select(BookCategoryLink.book_id).where(BookCategoryLink.category_id == category_id)
+            ))
+        db.execute(statement.execution_options(synchronize_session=False))
+
+    def search_fulltext(
+            self, db: Session, *, q: str, skip: int = 0, limit: int = 100
+    ) -> List[Tuple[Book, float]]:
+        return db.exec(_fulltext_statement(q, skip=skip, limit=limit)).all()
 
     def search_books(
             self,
@@ -103,24 +262,54 @@ class CRUDBook(CRUDBase[Book, BookCreate, BookUpdate]):
             author_id: Optional[int] = None,
             category_id: Optional[int] = None,  # Added to match the API parameter
             skip: int = 0,
-            limit: int = 100
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            expand: Iterable[str] = ()
     ) -> List[Book]:
-        query = select(Book)
+        query = _search_statement(
+            title=title, author_id=author_id, category_id=category_id,
+            skip=skip, limit=limit, cursor=cursor, expand=expand
+        )
+        results = db.exec(query).all()
+        return results
 
-        if title:
-            query = query.where(Book.title.ilike(f"%{title}%"))
 
-        if author_id:
-            query = query.join(BookAuthorLink,
-                               Book.id == BookAuthorLink.book_id).where(BookAuthorLink.author_id == author_id)
+class AsyncCRUDBook(AsyncCRUDBase[Book, BookCreate, BookUpdate]):
+    async def get_with_relations(
+            self, db: AsyncSession, id: int, *, expand: Iterable[str] = ()
+    ) -> Optional[Book]:
+        options = _expand_options(expand)
+        if not options:
+            return await self.get(db, id)
+        return await db.get(Book, id, options=options, populate_existing=True)
 
-        # Category filtering would go here when implemented
-        if category_id:
-             query = query.join(BookCategoryLink).where(BookCategoryLink.category_id == category_id)
+    async def get_availability_many(self, db: AsyncSession, book_ids: List[int]) -> List[BookAvailability]:
+        found = (await db.exec(BookService.availability_statement(book_ids))).all()
+        return BookService.to_availability(book_ids, found)
 
-        query = query.offset(skip).limit(limit)
-        results = db.exec(query).all()
-        return results
+    async def search_fulltext(
+            self, db: AsyncSession, *, q: str, skip: int = 0, limit: int = 100
+    ) -> List[Tuple[Book, float]]:
+        return (await db.exec(_fulltext_statement(q, skip=skip, limit=limit))).all()
+
+    async def search_books(
+            self,
+            db: AsyncSession,
+            *,
+            title: Optional[str] = None,
+            author_id: Optional[int] = None,
+            category_id: Optional[int] = None,
+            skip: int = 0,
+            limit: int = 100,
+            cursor: Optional[str] = None,
+            expand: Iterable[str] = ()
+    ) -> List[Book]:
+        query = _search_statement(
+            title=title, author_id=author_id, category_id=category_id,
+            skip=skip, limit=limit, cursor=cursor, expand=expand
+        )
+        return (await db.exec(query)).all()
 
 
-crud_books = CRUDBook(Book)
\ No newline at end of file
+crud_books = CRUDBook(Book, cache=entity_cache)
+async_crud_books = AsyncCRUDBook(crud_books)
\ No newline at end of file
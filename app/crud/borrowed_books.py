@@ -1,11 +1,139 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
 from sqlmodel import Session, select
+from app.config import get_settings
+from app.models.books import Book
 from app.models.borrowed_books import BorrowedBook, BorrowedBookCreate, BorrowedBookUpdate
+from app.models.users import User
 from app.crud.base import CRUDBase
+from app.crud.books import crud_books
+from app.crud.users import crud_users
+from app.services import fines, popularity
+from app.utils.exceptions import LibraryException
+from app.utils.pagination import paginate
+
+settings = get_settings()
+
+# deadlock_detected, serialization_failure
+RETRYABLE_PGCODES = {"40P01", "40001"}
+
 
 class CRUDBorrowedBook(CRUDBase[BorrowedBook, BorrowedBookCreate, BorrowedBookUpdate]):
-    def get_by_user(self, db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[BorrowedBook]:
-        statement = select(BorrowedBook).where(BorrowedBook.user_id == user_id).offset(skip).limit(limit)
+    def _adjust_borrow_count(self, db: Session, book_id: int, delta: int) -> None:
+        # Relative update so concurrent borrows/returns never overwrite each other
+        statement = (
+            update(Book)
+            .where(Book.id == book_id)
+            .values(active_borrow_count=Book.active_borrow_count + delta)
+        )
+        db.execute(statement)
+
+    def _adjust_user_borrow_count(self, db: Session, user_id: int, delta: int) -> None:
+        statement = (
+            update(User)
+            .where(User.id == user_id)
+            .values(active_borrow_count=User.active_borrow_count + delta)
+        )
+        db.execute(statement)
+
+    def _reserve(self, db: Session, user_id: int, book_id: int) -> None:
+        # Conditional UPDATEs: concurrent borrowers queue on the row lock and
+        # re-check the WHERE clause against the committed counter, so neither
+        # the user limit nor the book's copies can be overshot. The user row
+        # is always locked before the book row; returns and removals first
+        # claim the loan row, then release the user and book in this order.
+        user_slot = (
+            update(User)
+            .where(User.id == user_id, User.active_borrow_count < settings.MAX_BORROWS_PER_USER)
+            .values(active_borrow_count=User.active_borrow_count + 1)
+        )
+        if db.execute(user_slot).rowcount == 0:
+            if db.get(User, user_id) is None:
+                raise LibraryException("User not found")
+            raise LibraryException(
+                f"User with ID {user_id} already has {settings.MAX_BORROWS_PER_USER} active borrows", 409
+            )
+
+        copy = (
+            update(Book)
+            .where(Book.id == book_id, Book.active_borrow_count < Book.quantity)
+            .values(active_borrow_count=Book.active_borrow_count + 1)
+        )
+        if db.execute(copy).rowcount == 0:
+            if db.get(Book, book_id) is None:
+                raise LibraryException("Book not found")
+            raise LibraryException(f"No copies of book with ID {book_id} are available", 409)
+
+    def _borrow(self, db: Session, obj_in: BorrowedBookCreate) -> BorrowedBook:
+        db_obj = BorrowedBook(**obj_in.model_dump())
+        if db_obj.return_date is None:
+            # Stored rather than derived, so the open-loan due-date index
+            # does not depend on the loan period setting
+            db_obj.return_date = db_obj.borrowed_date + timedelta(days=settings.BORROW_DURATION_DAYS)
+        if db_obj.real_return_date is None:
+            self._reserve(db, db_obj.user_id, db_obj.book_id)
+        else:
+            # Already returned (history import), only the references are checked
+            if db.get(User, db_obj.user_id) is None:
+                raise LibraryException("User not found")
+            if db.get(Book, db_obj.book_id) is None:
+                raise LibraryException("Book not found")
+        db.add(db_obj)
+        popularity.record_borrow(db, db_obj.book_id, popularity.borrow_day(db_obj.borrowed_date), 1)
+        db.commit()
+        return db_obj
+
+    def create(self, db: Session, *, obj_in: BorrowedBookCreate) -> BorrowedBook:
+        attempt = 0
+        while True:
+            try:
+                db_obj = self._borrow(db, obj_in)
+                break
+            except LibraryException:
+                db.rollback()
+                raise
+            except OperationalError as e:
+                db.rollback()
+                if getattr(e.orig, "pgcode", None) not in RETRYABLE_PGCODES or attempt >= settings.BORROW_MAX_RETRIES:
+                    raise
+                attempt += 1
+                # Jittered exponential backoff so the retries do not collide again
+                time.sleep(random.uniform(0, settings.BORROW_RETRY_BACKOFF_MS * 2 ** attempt) / 1000)
+        crud_books.invalidate(db_obj.book_id)
+        crud_users.invalidate(db_obj.user_id)
+        db.refresh(db_obj)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> BorrowedBook:
+        # The row lock makes a concurrent return or removal wait, so the open
+        # check below is the committed state and the counters drop only once
+        obj = db.get(BorrowedBook, id, with_for_update=True, populate_existing=True)
+        if obj is None:
+            db.rollback()
+            raise LibraryException(f"Borrowed record with ID {id} not found", 404)
+        was_open = obj.real_return_date is None
+        if was_open:
+            self._adjust_user_borrow_count(db, obj.user_id, -1)
+            self._adjust_borrow_count(db, obj.book_id, -1)
+        popularity.record_borrow(db, obj.book_id, popularity.borrow_day(obj.borrowed_date), -1)
+        db.delete(obj)
+        db.commit()
+        if was_open:
+            crud_books.invalidate(obj.book_id)
+            crud_users.invalidate(obj.user_id)
+        return obj
+
+    def get_by_user(
+            self, db: Session, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[BorrowedBook]:
+        statement = paginate(
+            select(BorrowedBook).where(BorrowedBook.user_id == user_id),
+            BorrowedBook.id, skip=skip, limit=limit, cursor=cursor
+        )
         return db.exec(statement).all()
     
     def get_multi(
@@ -14,6 +142,7 @@ class CRUDBorrowedBook(CRUDBase[BorrowedBook, BorrowedBookCreate, BorrowedBookUp
         *,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
         user_id: Optional[int] = None,
         book_id: Optional[int] = None
     ) -> List[BorrowedBook]:
@@ -22,17 +151,31 @@ class CRUDBorrowedBook(CRUDBase[BorrowedBook, BorrowedBookCreate, BorrowedBookUp
             statement = statement.where(BorrowedBook.user_id == user_id)
         if book_id is not None:
             statement = statement.where(BorrowedBook.book_id == book_id)
-        statement = statement.offset(skip).limit(limit)
+        statement = paginate(statement, BorrowedBook.id, skip=skip, limit=limit, cursor=cursor)
         return db.exec(statement).all()
     
     def return_book(self, db: Session, borrowed_id: int) -> Optional[BorrowedBook]:
-        borrowed = db.get(BorrowedBook, borrowed_id)
-        if borrowed:
-            from datetime import datetime, timezone
-            borrowed.real_return_date = datetime.now(timezone.utc)
-            db.add(borrowed)
-            db.commit()
-            db.refresh(borrowed)
-        return borrowed
+        # Claim the loan first: of concurrent returns only the one whose
+        # UPDATE still finds it open gets a row back and releases the counters
+        claim = (
+            update(BorrowedBook)
+            .where(BorrowedBook.id == borrowed_id, BorrowedBook.real_return_date == None)
+            .values(real_return_date=datetime.now(timezone.utc))
+            .returning(
+                BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id,
+                BorrowedBook.borrowed_date, BorrowedBook.return_date, BorrowedBook.real_return_date,
+            )
+        )
+        claimed = db.execute(claim).first()
+        if claimed is not None:
+            self._adjust_user_borrow_count(db, claimed.user_id, -1)
+            self._adjust_borrow_count(db, claimed.book_id, -1)
+            # The nightly assessment only scans open loans
+            fines.settle_fine(db, claimed)
+        db.commit()
+        if claimed is not None:
+            crud_books.invalidate(claimed.book_id)
+            crud_users.invalidate(claimed.user_id)
+        return db.get(BorrowedBook, borrowed_id)
 
 crud_borrowed = CRUDBorrowedBook(BorrowedBook)
\ No newline at end of file
@@ -0,0 +1,229 @@
+# app/crud/cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.config import get_settings
+
+
+class CacheBackend:
+    """Key/value store for entity column data (plain dicts, never ORM objects).
+
+    Every delete or clear bumps generation(). A read-through fill passes the
+    generation it read before going to the database, and set() drops it if
+    an invalidation happened in between, so a stale row is never cached
+    after the write that replaced it.
+    """
+
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict, *, generation: Optional[int] = None) -> None:
+        raise NotImplementedError
+
+    def generation(self) -> int:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def info(self) -> dict:
+        return {"backend": type(self).__name__}
+
+
+class LRUCache(CacheBackend):
+    def __init__(self, maxsize: int = 10000, ttl_seconds: float = 60):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._generation = 0
+        self._data: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, *, generation: Optional[int] = None) -> None:
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def generation(self) -> int:
+        return self._generation
+
+    def info(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self.evictions,
+        }
+
+
+class LocalSharedStore:
+    """In-memory stand-in for the Redis client API used by SharedCache."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            _, value = self._data.get(key, (None, b"0"))
+            value = int(value) + 1
+            self._data[key] = (None, str(value).encode())
+            return value
+
+    def scan_iter(self, match: str) -> Iterator[str]:
+        prefix = match.rstrip("*")
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+        return iter(keys)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Cannot cache {type(value).__name__}")
+
+
+def _json_object_hook(obj: dict):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+class SharedCache(CacheBackend):
+    """Cache shared by every worker through a Redis-compatible client.
+
+    Values are stored as JSON, never pickled: whatever sits in the store is
+    decoded into plain column data and cannot execute code when read back.
+    """
+
+    def __init__(self, client: Any, ttl_seconds: int = 60, prefix: str = "library:entity:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.generation_key = prefix + "__generation__"
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw, object_hook=_json_object_hook) if raw is not None else None
+
+    def set(self, key: str, value: dict, *, generation: Optional[int] = None) -> None:
+        if generation is not None and generation != self.generation():
+            return
+        self.client.set(self.prefix + key, json.dumps(value, default=_json_default), ex=self.ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.client.incr(self.generation_key)
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        self.client.incr(self.generation_key)
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            if key not in (self.generation_key, self.generation_key.encode()):
+                self.client.delete(key)
+
+    def generation(self) -> int:
+        return int(self.client.get(self.generation_key) or 0)
+
+    def info(self) -> dict:
+        return {"backend": type(self).__name__, "client": type(self.client).__name__, "ttl_seconds": self.ttl_seconds}
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def build_cache_backend(
+        settings, *, namespace: str = "entity", ttl_seconds: Optional[int] = None
+) -> Optional[CacheBackend]:
+    backend = settings.ENTITY_CACHE_BACKEND.lower()
+    ttl_seconds = ttl_seconds or settings.ENTITY_CACHE_TTL_SECONDS
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return LRUCache(maxsize=settings.ENTITY_CACHE_MAXSIZE, ttl_seconds=ttl_seconds)
+    if backend == "shared":
+        if settings.ENTITY_CACHE_URL:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("ENTITY_CACHE_URL is set but the 'redis' package is not installed")
+            client = redis.Redis.from_url(settings.ENTITY_CACHE_URL)
+        else:
+            client = LocalSharedStore()
+        return SharedCache(client, ttl_seconds=ttl_seconds, prefix=f"library:{namespace}:")
+    raise ValueError(f"Unknown ENTITY_CACHE_BACKEND: {settings.ENTITY_CACHE_BACKEND}")
+
+
+entity_cache = build_cache_backend(get_settings())
+cache_stats: Dict[str, CacheStats] = {}
@@ -1,11 +1,36 @@
 from typing import Optional
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models.categories import Category, CategoryCreate, CategoryUpdate
-from app.crud.base import CRUDBase
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.books import crud_books
+from app.crud.cache import entity_cache
 
 class CRUDCategory(CRUDBase[Category, CategoryCreate, CategoryUpdate]):
     def get_by_name(self, db: Session, name: str) -> Optional[Category]:
         statement = select(Category).where(Category.name == name)
         return db.exec(statement).first()
 
-crud_categories = CRUDCategory(Category)
\ No newline at end of file
+    def update(self, db: Session, *, db_obj: Category, obj_in: CategoryUpdate) -> Category:
+        update_data = obj_in.model_dump(exclude_unset=True)
+
+        for field in update_data:
+            setattr(db_obj, field, update_data[field])
+
+        db.add(db_obj)
+        if "name" in update_data:
+            db.flush()
+            crud_books.refresh_search_vector(db, category_id=db_obj.id)
+        db.commit()
+        self.invalidate(db_obj.id)
+        db.refresh(db_obj)
+        return db_obj
+
+
+class AsyncCRUDCategory(AsyncCRUDBase[Category, CategoryCreate, CategoryUpdate]):
+    async def get_by_name(self, db: AsyncSession, name: str) -> Optional[Category]:
+        statement = select(Category).where(Category.name == name)
+        return (await db.exec(statement)).first()
+
+crud_categories = CRUDCategory(Category, cache=entity_cache)
+async_crud_categories = AsyncCRUDCategory(crud_categories)
\ No newline at end of file
@@ -1,16 +1,130 @@
+import time
 from typing import Optional, List
-from sqlmodel import Session, select
+from sqlalchemy import inspect, update
+from sqlmodel import Session, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import get_settings
+from app.models.borrowed_books import BorrowedBook
 from app.models.users import User, UserCreate, UserUpdate
-from app.crud.base import CRUDBase
+from app.crud.base import AsyncCRUDBase, CRUDBase
+from app.crud.cache import CacheBackend, build_cache_backend, entity_cache
+from app.utils.pagination import paginate
+
+settings = get_settings()
+
+def _active_statement(skip: int, limit: int, cursor: Optional[str]):
+    return paginate(
+        select(User).where(User.is_active == True), User.id, skip=skip, limit=limit, cursor=cursor
+    )
+
+
+class PrincipalCache:
+    """Authenticated users by token subject (email), minus the password hash.
+
+    Entries are dropped when the user is updated or deleted. Deactivated,
+    deleted or renamed subjects are also revoked: tokens issued before the
+    revocation are refused. Other workers only see the invalidation and the
+    revocation with ENTITY_CACHE_BACKEND=shared and an ENTITY_CACHE_URL;
+    with a per-process backend they keep their entry until it expires
+    (PRINCIPAL_CACHE_TTL_SECONDS). Revocations live as long as a token can,
+    so the set stays small.
+    """
+
+    def __init__(self, principals: Optional[CacheBackend], revocations: Optional[CacheBackend]):
+        self.principals = principals
+        self.revocations = revocations
+
+    def get(self, subject: str) -> Optional[User]:
+        if self.principals is None:
+            return None
+        data = self.principals.get(subject)
+        return User(**data) if data is not None else None
+
+    def set(self, user: User) -> None:
+        if self.principals is not None:
+            columns = inspect(User).column_attrs
+            self.principals.set(user.email, {
+                attr.key: getattr(user, attr.key) for attr in columns if attr.key != "hashed_password"
+            })
+
+    def invalidate(self, subject: str) -> None:
+        if self.principals is not None:
+            self.principals.delete(subject)
+
+    def revoke(self, subject: str) -> None:
+        self.invalidate(subject)
+        if self.revocations is not None:
+            # Whole seconds like the JWT iat. A token from the same second
+            # passes, the evicted principal is reloaded from the database
+            # and a deactivated, deleted or renamed subject fails there.
+            self.revocations.set(subject, {"revoked_at": int(time.time())})
+
+    def is_revoked(self, subject: str, issued_at: int) -> bool:
+        if self.revocations is None:
+            return False
+        entry = self.revocations.get(subject)
+        return entry is not None and issued_at < entry["revoked_at"]
+
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    def update(self, db: Session, *, db_obj: User, obj_in: UserUpdate) -> User:
+        subject = db_obj.email
+        user = super().update(db, db_obj=db_obj, obj_in=obj_in)
+        if not user.is_active or user.email != subject:
+            principal_cache.revoke(subject)
+        else:
+            principal_cache.invalidate(subject)
+        return user
+
+    def remove(self, db: Session, *, id: int) -> User:
+        user = super().remove(db, id=id)
+        principal_cache.revoke(user.email)
+        return user
+
+    def reconcile_borrow_counts(self, db: Session) -> int:
+        """Recount open loans for users whose counter drifted, returns rows fixed."""
+        open_loans = (
+            select(func.count(BorrowedBook.id))
+            .where(
+                (BorrowedBook.user_id == User.id) &
+                (BorrowedBook.real_return_date == None)
+            )
+            .scalar_subquery()
+        )
+        statement = (
+            update(User)
+            .where(User.active_borrow_count != open_loans)
+            .values(active_borrow_count=open_loans)
+            .execution_options(synchronize_session=False)
+        )
+        fixed = db.execute(statement).rowcount
+        db.commit()
+        return fixed
+
     def get_by_email(self, db: Session, email: str) -> Optional[User]:
         statement = select(User).where(User.email == email)
         result = db.exec(statement).first()
         return result
 
-    def get_active(self, db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-        statement = select(User).where(User.is_active == True).offset(skip).limit(limit)
-        return db.exec(statement).all()
+    def get_active(
+            self, db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[User]:
+        return db.exec(_active_statement(skip, limit, cursor)).all()
+
+
+class AsyncCRUDUser(AsyncCRUDBase[User, UserCreate, UserUpdate]):
+    async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
+        statement = select(User).where(User.email == email)
+        return (await db.exec(statement)).first()
+
+    async def get_active(
+            self, db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[User]:
+        return (await db.exec(_active_statement(skip, limit, cursor))).all()
 
-crud_users = CRUDUser(User)
\ No newline at end of file
+principal_cache = PrincipalCache(
+    build_cache_backend(settings, namespace="principal", ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS),
+    build_cache_backend(settings, namespace="revoked", ttl_seconds=settings.JWT_EXPIRATION_MINUTES * 60),
+)
+crud_users = CRUDUser(User, cache=entity_cache, cache_exclude=("hashed_password",))
+async_crud_users = AsyncCRUDUser(crud_users)
\ No newline at end of file
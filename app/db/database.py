@@ -1,20 +1,46 @@
-from typing import Generator
+import logging
+from typing import AsyncGenerator, Generator
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel, create_engine, Session, inspect
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.config import get_settings
-from app.utils.logger import setup_logging
+from app.db.pool import pool_options
 
 
 settings = get_settings()
-logger = setup_logging(log_level_str=settings.LOG_LEVEL if hasattr(settings, "LOG_LEVEL") else "INFO")
+logger = logging.getLogger("library_api")
 
 logger.info("DATABASE_URL: %s", settings.DATABASE_URL)
 
 engine = create_engine(
     settings.DATABASE_URL,
-    echo=True if settings.ENVIRONMENT == "development" else False
+    echo=True if settings.ENVIRONMENT == "development" else False,
+    **pool_options("sync", settings)
+)
+
+
+def to_async_url(database_url: str) -> str:
+    # postgresql://, postgresql+psycopg2://... -> postgresql+asyncpg://
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+async_engine = create_async_engine(
+    to_async_url(settings.DATABASE_URL),
+    echo=True if settings.ENVIRONMENT == "development" else False,
+    **pool_options("async", settings, AsyncAdaptedQueuePool)
 )
 
 
 def get_session() -> Generator[Session, Session, None]:
     with Session(engine) as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,116 @@
+# app/db/pool.py
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger("library_api")
+
+# Upper bounds in milliseconds, the last bucket is +Inf
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Checkout wait-time histogram and saturation counters for one pool."""
+
+    def __init__(self, name: str, warn_threshold_ms: float):
+        self.name = name
+        self.warn_threshold_ms = warn_threshold_ms
+        self.pool: QueuePool = None
+        self._lock = threading.Lock()
+        self.buckets: List[int] = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.wait_ms_sum = 0.0
+        self.wait_ms_max = 0.0
+
+    def observe(self, wait_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.checkouts += 1
+            self.wait_ms_sum += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            if timed_out:
+                self.timeouts += 1
+            if wait_ms >= self.warn_threshold_ms:
+                self.slow_checkouts += 1
+        if timed_out or wait_ms >= self.warn_threshold_ms:
+            logger.warning(
+                "DB pool %s checkout waited %.1f ms%s (%s)",
+                self.name, wait_ms, " and timed out" if timed_out else "", self.status_line()
+            )
+
+    def status_line(self) -> str:
+        if self.pool is None:
+            return "pool not created"
+        return (
+            f"checked_out={self.pool.checkedout()} idle={self.pool.checkedin()} "
+            f"overflow={self.pool.overflow()} size={self.pool.size()}"
+        )
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            cumulative, histogram = 0, {}
+            for bound, count in zip([*WAIT_BUCKETS_MS, "+Inf"], self.buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            return {
+                "size": pool.size() if pool else 0,
+                "checked_out": pool.checkedout() if pool else 0,
+                "idle": pool.checkedin() if pool else 0,
+                "overflow": pool.overflow() if pool else 0,
+                "max_overflow": pool._max_overflow if pool else 0,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_checkouts": self.slow_checkouts,
+                "wait_ms_sum": round(self.wait_ms_sum, 3),
+                "wait_ms_max": round(self.wait_ms_max, 3),
+                "wait_ms_buckets": histogram,
+            }
+
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def instrumented_pool(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """QueuePool subclass timing every checkout.
+
+    Metrics live on the class because Pool.recreate() (engine.dispose())
+    builds the replacement pool from self.__class__.
+    """
+
+    class InstrumentedPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            metrics.pool = self
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.observe((time.perf_counter() - start) * 1000, timed_out=True)
+                raise
+            metrics.observe((time.perf_counter() - start) * 1000)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def pool_options(name: str, settings, base: Type[QueuePool] = QueuePool) -> dict:
+    metrics = pool_metrics[name] = PoolMetrics(name, settings.DB_POOL_WAIT_WARN_MS)
+    return {
+        "poolclass": instrumented_pool(base, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
@@ -0,0 +1,79 @@
+# app/db/profiler.py
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.utils.logger import setup_slow_query_logging
+
+settings = get_settings()
+slow_query_logger = setup_slow_query_logging()
+
+MAX_LOGGED_PARAMETER_SETS = 10
+
+
+class QueryProfile:
+    """Queries issued and time spent in the database during one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration_ms:.2f};desc="{self.count} queries"'
+
+
+# Holds a mutable QueryProfile so that the threadpool (sync routes) and the
+# task running the app behind call_next add to the same object
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def start_profile() -> QueryProfile:
+    profile = QueryProfile()
+    _current_profile.set(profile)
+    return profile
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current_profile.get()
+
+
+def _format_parameters(parameters, executemany: bool):
+    if executemany and len(parameters) > MAX_LOGGED_PARAMETER_SETS:
+        return f"{parameters[:MAX_LOGGED_PARAMETER_SETS]!r} ... ({len(parameters)} parameter sets)"
+    return repr(parameters)
+
+
+# Registered on the Engine class so the sync engine, the async engine's
+# sync_engine and ad-hoc engines (CLI tools, tests) are all covered
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.count += 1
+        profile.duration += duration
+    if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        slow_query_logger.warning(
+            "%.2f ms | %s | parameters: %s",
+            duration * 1000, " ".join(statement.split()), _format_parameters(parameters, executemany)
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # after_cursor_execute does not run for failed statements
+    if context.connection is not None and context.connection.info.get("query_start_time"):
+        context.connection.info["query_start_time"].pop()
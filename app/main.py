@@ -7,15 +7,22 @@ import time
 
 
 from app.utils.logger import setup_logging
-from app.api import books, authors, categories, users, borrowed_books, stats
 
-from fastapi.responses import JSONResponse
+# Configured before the routers are imported so their modules log through it
+logger = setup_logging()
+
+from app.db.profiler import start_profile
+from app.api import books, authors, categories, users, borrowed_books, stats, search, export
+
+from fastapi.responses import JSONResponse, Response
 from fastapi.requests import Request
 from fastapi.exception_handlers import RequestValidationError
 from fastapi.exceptions import HTTPException
-
-
-logger = setup_logging()
+from app.utils.exceptions import LibraryException
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.metrics import (
+    CONTENT_TYPE_LATEST, IN_FLIGHT, mark_worker_dead, observe_request, render_metrics
+)
 
 
 # Define the lifespan context manager
@@ -27,6 +34,7 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown logic
+    mark_worker_dead()
     logger.info("Application Shutdown")
 
 
@@ -44,26 +52,34 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER]
 )
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
-    response = await call_next(request)
+    profile = start_profile()
+    in_flight = IN_FLIGHT.labels(request.method)
+    in_flight.inc()
+    try:
+        response = await call_next(request)
+    finally:
+        in_flight.dec()
     process_time = time.time() - start_time
+    observe_request(request, response.status_code, process_time, profile)
+    response.headers["Server-Timing"] = f"{profile.server_timing()}, app;dur={process_time * 1000:.2f}"
     logger.info(
-        f"Path: {request.url.path} | "
-        f"Method: {request.method} | "
-        f"Status: {response.status_code} | "
-        f"Duration: {process_time:.4f}s"
+        "Path: %s | Method: %s | Status: %s | Duration: %.4fs | Queries: %d | DB: %.4fs",
+        request.url.path, request.method, response.status_code, process_time,
+        profile.count, profile.duration
     )
     return response
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Unhandled error: {exc}", exc_info=True)
+    logger.error("Unhandled error: %s", exc, exc_info=True)
     return JSONResponse(
         status_code=500,
         content={"detail": "Internal Server Error"}
@@ -71,7 +87,15 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.error(f"HTTP error: {exc.detail}", exc_info=True)
+    logger.error("HTTP error: %s", exc.detail, exc_info=True)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail}
+    )
+
+@app.exception_handler(LibraryException)
+async def library_exception_handler(request: Request, exc: LibraryException):
+    logger.error("Library error: %s", exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
@@ -79,7 +103,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"Validation error: {exc.errors()}", exc_info=True)
+    logger.error("Validation error: %s", exc.errors(), exc_info=True)
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors()}
@@ -92,9 +116,15 @@ app.include_router(categories.router, prefix="/api/categories", tags=["categorie
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(borrowed_books.router, prefix="/api/borrowed_books", tags=["borrowed_books"])
 app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 @app.get("/")
 def root():
     return {"message": "Welcome to Library Management System API"}
@@ -1,8 +1,9 @@
 
 from typing import List, Optional, TYPE_CHECKING
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime, timezone
-from app.models.books import BookAuthorLink
+from app.models.books import BookAuthorLink, pg_trgm_installed
 
 
 if TYPE_CHECKING:
@@ -16,6 +17,13 @@ class AuthorBase(SQLModel):
 
 
 class Author(AuthorBase, table=True):
+    __table_args__ = (
+        # Must match AUTHOR_FULL_NAME in app/services/suggest.py to be used
+        Index(
+            "ix_author_full_name_trgm", text("(first_name || ' ' || last_name) gin_trgm_ops"), postgresql_using="gin"
+        ).ddl_if(callable_=pg_trgm_installed),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
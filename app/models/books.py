@@ -6,12 +6,26 @@ if TYPE_CHECKING:
     from app.models.categories import Category
     from app.models.borrowed_books import BorrowedBook
 
+from sqlalchemy import Column, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime, timezone
 
 
+def pg_trgm_installed(ddl, target, bind, **kw) -> bool:
+    # The trigram indexes come with migration 9d4e1a6b3c27, which installs
+    # pg_trgm; create_all only builds them where the extension exists
+    return bind is not None and bind.exec_driver_sql(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+    ).first() is not None
+
+
 class BookAuthorLink(SQLModel, table=True):
     __tablename__ = "book_author_link"
+    # The primary key leads with book_id, books by author need their own index
+    __table_args__ = (
+        Index("ix_book_author_link_author_id", "author_id"),
+    )
 
     book_id: Optional[int] = Field(
         default=None, foreign_key="book.id", primary_key=True
@@ -23,6 +37,9 @@ class BookAuthorLink(SQLModel, table=True):
 
 class BookCategoryLink(SQLModel, table=True):
     __tablename__ = "book_category_link"
+    __table_args__ = (
+        Index("ix_book_category_link_category_id", "category_id"),
+    )
 
     book_id: Optional[int] = Field(
         default=None, foreign_key="book.id", primary_key=True
@@ -40,9 +57,20 @@ class BookBase(SQLModel):
 
 
 class Book(BookBase, table=True):
+    __table_args__ = (
+        Index("ix_book_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_book_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}
+        ).ddl_if(callable_=pg_trgm_installed),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Open loans, kept in step by CRUDBorrowedBook and BookService.reconcile_borrow_counts
+    active_borrow_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # Title + author names + category names, maintained by CRUDBook.refresh_search_vector
+    search_vector: Optional[str] = Field(default=None, sa_column=Column(TSVECTOR, nullable=True))
     
     authors: List["Author"] = Relationship(
         back_populates="books",
@@ -52,6 +80,8 @@ class Book(BookBase, table=True):
         back_populates="books",
         link_model=BookCategoryLink
     )
+    # Read-only, for dependency checks; loans are removed by the FK cascade
+    borrowed_books: List["BorrowedBook"] = Relationship(sa_relationship_kwargs={"viewonly": True})
 
 
 class BookCreate(BookBase):
@@ -75,30 +105,96 @@ class BookRead(BookBase):
 
     class Config:
         form_attributes = True
+
+
+class BookSearchResult(BookRead):
+    rank: float
+
+
+class BookAvailability(SQLModel):
+    book_id: int
+    total_copies: int
+    available_copies: int
+    is_available: bool
+
+
+class BookAvailabilityRequest(SQLModel):
+    book_ids: List[int] = Field(min_length=1, max_length=500)
+
+
+class BookImportError(SQLModel):
+    row: int
+    isbn: Optional[str] = None
+    detail: str
+
+
+class BookImportReport(SQLModel):
+    imported: int = 0
+    failed: int = 0
+    errors: List[BookImportError] = Field(default_factory=list)
         
         
 class BookService:
     def has_active_borrows(self, db, book_id: int) -> bool:
-        from app.models.borrowed_books import BorrowedBook  # Додайте цей імпорт!
-        from sqlmodel import select
-        statement = select(BorrowedBook).where(
-            (BorrowedBook.book_id == book_id) &
-            (BorrowedBook.real_return_date == None)
-        )
-        return db.exec(statement).first() is not None
+        book = db.get(Book, book_id)
+        return book is not None and book.active_borrow_count > 0
 
     def get_available_copies(self, db, book_id: int) -> int:
-        from app.models.borrowed_books import BorrowedBook  # Додайте цей імпорт!
-        from app.models.books import Book
         if not book_id:
             return 0
         book = db.get(Book, book_id)
         if not book:
             return 0
+        return book.quantity - book.active_borrow_count
+
+    @staticmethod
+    def availability_statement(book_ids: List[int]):
+        # One indexed IN query for the whole page
         from sqlmodel import select
-        statement = select(BorrowedBook).where(
-            (BorrowedBook.book_id == book_id) &
-            (BorrowedBook.real_return_date == None)
+        return select(Book.id, Book.quantity, Book.active_borrow_count).where(
+            Book.id.in_(set(book_ids))
+        )
+
+    @staticmethod
+    def to_availability(book_ids: List[int], found) -> List[BookAvailability]:
+        # Keeps the request order, unknown ids are skipped
+        rows = {book_id: (quantity, borrowed) for book_id, quantity, borrowed in found}
+        result = []
+        for book_id in dict.fromkeys(book_ids):
+            if book_id not in rows:
+                continue
+            quantity, borrowed = rows[book_id]
+            result.append(BookAvailability(
+                book_id=book_id,
+                total_copies=quantity,
+                available_copies=quantity - borrowed,
+                is_available=quantity - borrowed > 0
+            ))
+        return result
+
+    def get_availability_many(self, db, book_ids: List[int]) -> List[BookAvailability]:
+        found = db.exec(self.availability_statement(book_ids)).all()
+        return self.to_availability(book_ids, found)
+
+    def reconcile_borrow_counts(self, db) -> int:
+        """Recount open loans for books whose counter drifted, returns rows fixed."""
+        from app.models.borrowed_books import BorrowedBook
+        from sqlalchemy import update
+        from sqlmodel import func, select
+        open_loans = (
+            select(func.count(BorrowedBook.id))
+            .where(
+                (BorrowedBook.book_id == Book.id) &
+                (BorrowedBook.real_return_date == None)
+            )
+            .scalar_subquery()
+        )
+        statement = (
+            update(Book)
+            .where(Book.active_borrow_count != open_loans)
+            .values(active_borrow_count=open_loans)
+            .execution_options(synchronize_session=False)
         )
-        active_borrows = db.exec(statement).all()
-        return book.quantity - len(active_borrows)    
+        fixed = db.execute(statement).rowcount
+        db.commit()
+        return fixed
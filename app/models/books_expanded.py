@@ -0,0 +1,11 @@
+from typing import List, Optional
+
+from app.models.authors import AuthorRead
+from app.models.books import BookRead
+from app.models.categories import CategoryRead
+
+
+class BookReadWithRelations(BookRead):
+    # Only present in the response when requested with ?expand=
+    authors: Optional[List[AuthorRead]] = None
+    categories: Optional[List[CategoryRead]] = None
@@ -1,6 +1,7 @@
 from typing import Optional, TYPE_CHECKING
 if TYPE_CHECKING:
     from app.models.users import User
+from sqlalchemy import Index, text
 from sqlmodel import Field, SQLModel, Relationship
 from datetime import datetime, timezone
 
@@ -13,6 +14,17 @@ class BorrowedBookBase(SQLModel):
 
 class BorrowedBook(BorrowedBookBase, table=True):
     __tablename__ = "borrowed_book"
+    __table_args__ = (
+        Index("ix_borrowed_book_book_id_real_return_date", "book_id", "real_return_date"),
+        Index("ix_borrowed_book_user_id_borrowed_date", "user_id", "borrowed_date"),
+        # Open loans by due date, then id for the overdue list's keyset.
+        # return_date is set on every borrow, BORROW_DURATION_DAYS after
+        # borrowed_date unless the client agreed another date
+        Index(
+            "ix_borrowed_book_open_due_date", "return_date", "id",
+            postgresql_where=text("real_return_date IS NULL"),
+        ),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     user: "User" = Relationship(back_populates="borrowed_books")
@@ -0,0 +1,41 @@
+# app/models/fines.py
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+from app.models.borrowed_books import BorrowedBookRead
+
+
+class Fine(SQLModel, table=True):
+    # Ledger of fines, one row per overdue loan, refreshed by app.services.fines
+    # and settled when the loan is returned
+    __tablename__ = "fine"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    borrowed_book_id: int = Field(foreign_key="borrowed_book.id", unique=True, ondelete="CASCADE")
+    user_id: int = Field(foreign_key="user.id", index=True)
+    book_id: int = Field(foreign_key="book.id", index=True, ondelete="CASCADE")
+    due_date: datetime
+    days_overdue: int
+    amount: float
+    assessed_at: datetime
+
+
+class OverdueLoan(BorrowedBookRead):
+    due_date: datetime
+    days_overdue: int
+    fine: float
+
+
+class UserFineTotal(SQLModel):
+    user_id: int
+    loans: int
+    total_fines: float
+
+
+class FineAssessmentReport(SQLModel):
+    scanned: int = 0
+    overdue: int = 0
+    total_fines: float = 0.0
+    seconds: float = 0.0
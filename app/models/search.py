@@ -0,0 +1,15 @@
+from typing import List
+from sqlmodel import Field, SQLModel
+
+
+class Suggestion(SQLModel):
+    id: int
+    label: str
+    score: float
+
+
+class SuggestResults(SQLModel):
+    query: str
+    source: str
+    books: List[Suggestion] = Field(default_factory=list)
+    authors: List[Suggestion] = Field(default_factory=list)
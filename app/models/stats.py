@@ -0,0 +1,38 @@
+# app/models/stats.py
+from datetime import date
+
+from sqlmodel import Field, SQLModel
+
+
+# Borrow counters rolled up per book, author and category. Maintained by
+# app.services.popularity in the same transaction as the borrow, so the
+# /api/stats popularity endpoints are a top-N scan of the borrow_count index.
+
+class BookBorrowStats(SQLModel, table=True):
+    __tablename__ = "book_borrow_stats"
+
+    book_id: int = Field(foreign_key="book.id", primary_key=True, ondelete="CASCADE")
+    borrow_count: int = Field(default=0, index=True)
+
+
+class BookBorrowDaily(SQLModel, table=True):
+    # One bucket per book and borrow day (UTC), windowed stats sum these
+    __tablename__ = "book_borrow_daily"
+
+    day: date = Field(primary_key=True)
+    book_id: int = Field(foreign_key="book.id", primary_key=True, index=True, ondelete="CASCADE")
+    borrow_count: int = Field(default=0)
+
+
+class AuthorBorrowStats(SQLModel, table=True):
+    __tablename__ = "author_borrow_stats"
+
+    author_id: int = Field(foreign_key="author.id", primary_key=True, ondelete="CASCADE")
+    borrow_count: int = Field(default=0, index=True)
+
+
+class CategoryBorrowStats(SQLModel, table=True):
+    __tablename__ = "category_borrow_stats"
+
+    category_id: int = Field(foreign_key="category.id", primary_key=True, ondelete="CASCADE")
+    borrow_count: int = Field(default=0, index=True)
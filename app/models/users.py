@@ -19,6 +19,8 @@ class User(UserBase, table=True):
     registration_date: datetime = Field(default_factory=datetime.utcnow)
     is_active: bool = Field(default=True)
     hashed_password: str
+    # Open loans, kept in step by CRUDBorrowedBook and CRUDUser.reconcile_borrow_counts
+    active_borrow_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
 
     # Relationships
     borrowed_books: List["BorrowedBook"] = Relationship(
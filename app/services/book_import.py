@@ -0,0 +1,219 @@
+# app/services/book_import.py
+import argparse
+import csv
+import json
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.crud.books import crud_books
+from app.models.authors import Author
+from app.models.books import (
+    Book, BookAuthorLink, BookCategoryLink, BookCreate, BookImportError, BookImportReport
+)
+from app.models.categories import Category
+from app.services.suggest import suggest_index
+
+CHUNK_SIZE = 1000
+FORMATS = ("csv", "ndjson")
+ID_SEPARATORS = (";", "|")
+
+
+def _split_ids(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    for separator in ID_SEPARATORS:
+        value = value.replace(separator, " ")
+    return value.split()
+
+
+def read_csv_rows(stream: TextIO) -> Iterator[Tuple[int, dict]]:
+    # author_ids / category_ids are separated by ";" or "|" inside a CSV cell
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # Empty cells fall back to the model defaults
+        row = {key: value for key, value in row.items() if value not in ("", None)}
+        row["author_ids"] = _split_ids(row.get("author_ids"))
+        row["category_ids"] = _split_ids(row.get("category_ids"))
+        yield reader.line_num, row
+
+
+def read_ndjson_rows(stream: TextIO) -> Iterator[Tuple[int, str]]:
+    for line_num, line in enumerate(stream, start=1):
+        if line.strip():
+            yield line_num, line
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    if not filename:
+        return None
+    extension = filename.rsplit(".", 1)[-1].lower()
+    if extension in ("ndjson", "jsonl"):
+        return "ndjson"
+    if extension == "csv":
+        return "csv"
+    return None
+
+
+class BookImporter:
+    """Imports books in chunks with one set-based query per lookup.
+
+    Rows that fail validation or reference unknown authors/categories are
+    reported in the BookImportReport and never abort the rest of the feed.
+    """
+
+    def __init__(self, db: Session, *, chunk_size: int = CHUNK_SIZE):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.report = BookImportReport()
+        self.isbn_filter = crud_books.build_isbn_filter(db)
+        self.seen_isbns: Set[str] = set()
+
+    def run(self, stream: TextIO, fmt: str) -> BookImportReport:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+        rows = read_csv_rows(stream) if fmt == "csv" else read_ndjson_rows(stream)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        if self.report.imported:
+            suggest_index.invalidate()
+        return self.report
+
+    def _fail(self, row: int, detail: str, isbn: Optional[str] = None) -> None:
+        self.report.failed += 1
+        self.report.errors.append(BookImportError(row=row, isbn=isbn, detail=detail))
+
+    def _parse(self, raw) -> BookCreate:
+        if isinstance(raw, str):
+            return BookCreate.model_validate_json(raw)
+        return BookCreate.model_validate(raw)
+
+    def _import_chunk(self, chunk: List[Tuple[int, object]]) -> None:
+        parsed: List[Tuple[int, BookCreate]] = []
+        for row_num, raw in chunk:
+            try:
+                book = self._parse(raw)
+            except ValidationError as e:
+                self._fail(row_num, "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            parsed.append((row_num, book))
+
+        # Only ISBNs the filter cannot rule out need an index probe
+        existing_isbns = crud_books.existing_isbns(
+            self.db, [book.isbn for _, book in parsed if book.isbn in self.isbn_filter]
+        )
+        author_ids = {a for _, book in parsed for a in book.author_ids}
+        category_ids = {c for _, book in parsed for c in book.category_ids}
+        known_authors = set(self.db.exec(select(Author.id).where(Author.id.in_(author_ids))).all()) \
+            if author_ids else set()
+        known_categories = set(self.db.exec(select(Category.id).where(Category.id.in_(category_ids))).all()) \
+            if category_ids else set()
+
+        # An ISBN is only taken once a row carrying it passed every check,
+        # a rejected row does not shadow a later valid one
+        valid: List[Tuple[int, BookCreate]] = []
+        chunk_isbns: Set[str] = set()
+        for row_num, book in parsed:
+            if book.isbn in self.seen_isbns or book.isbn in chunk_isbns:
+                self._fail(row_num, f"Duplicate ISBN {book.isbn} in import", book.isbn)
+            elif book.isbn in existing_isbns:
+                self._fail(row_num, f"Book with ISBN {book.isbn} already exists", book.isbn)
+            elif missing := sorted(set(book.author_ids) - known_authors):
+                self._fail(row_num, f"Author with ID {missing[0]} not found", book.isbn)
+            elif missing := sorted(set(book.category_ids) - known_categories):
+                self._fail(row_num, f"Category with ID {missing[0]} not found", book.isbn)
+            else:
+                valid.append((row_num, book))
+                chunk_isbns.add(book.isbn)
+        self.seen_isbns |= chunk_isbns
+
+        if not valid:
+            return
+        try:
+            self._insert(valid)
+            self.db.commit()
+            self.report.imported += len(valid)
+        except IntegrityError:
+            # Someone else inserted a conflicting row meanwhile, retry row by row
+            self.db.rollback()
+            self._insert_one_by_one(valid)
+        for _, book in valid:
+            self.isbn_filter.add(book.isbn)
+
+    def _insert(self, rows: List[Tuple[int, BookCreate]]) -> None:
+        now = datetime.now(timezone.utc)
+        book_rows = [
+            {
+                "title": book.title,
+                "publication_year": book.publication_year,
+                "isbn": book.isbn,
+                "quantity": book.quantity,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for _, book in rows
+        ]
+        result = self.db.execute(insert(Book).returning(Book.id, Book.isbn), book_rows)
+        ids_by_isbn: Dict[str, int] = {isbn: book_id for book_id, isbn in result}
+
+        author_links = [
+            {"book_id": ids_by_isbn[book.isbn], "author_id": author_id}
+            for _, book in rows for author_id in set(book.author_ids)
+        ]
+        category_links = [
+            {"book_id": ids_by_isbn[book.isbn], "category_id": category_id}
+            for _, book in rows for category_id in set(book.category_ids)
+        ]
+        if author_links:
+            self.db.execute(insert(BookAuthorLink), author_links)
+        if category_links:
+            self.db.execute(insert(BookCategoryLink), category_links)
+        crud_books.refresh_search_vector(self.db, book_ids=ids_by_isbn.values())
+
+    def _insert_one_by_one(self, rows: List[Tuple[int, BookCreate]]) -> None:
+        for row_num, book in rows:
+            try:
+                self._insert([(row_num, book)])
+                self.db.commit()
+                self.report.imported += 1
+            except IntegrityError as e:
+                self.db.rollback()
+                self._fail(row_num, str(e.orig).strip(), book.isbn)
+
+
+def import_books(
+        db: Session, stream: TextIO, fmt: str, *, chunk_size: int = CHUNK_SIZE
+) -> BookImportReport:
+    return BookImporter(db, chunk_size=chunk_size).run(stream, fmt)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Bulk import books from a CSV or NDJSON feed")
+    parser.add_argument("path", help="Path to the feed file")
+    parser.add_argument("--format", choices=FORMATS, help="Feed format, detected from the extension by default")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("Cannot detect the feed format, pass --format")
+
+    with open(args.path, encoding="utf-8", newline="") as stream, Session(engine) as db:
+        report = import_books(db, stream, fmt, chunk_size=args.chunk_size)
+    print(json.dumps(report.model_dump(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
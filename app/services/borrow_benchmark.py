@@ -0,0 +1,116 @@
+# app/services/borrow_benchmark.py
+"""Contention benchmark for the borrow engine.
+
+Hundreds of borrowers race for the copies of a single title, each from
+its own session and thread. The run checks that exactly min(copies,
+borrowers) loans were granted and that the counters match the rows:
+
+    python -m app.services.borrow_benchmark --borrowers 300 --copies 50
+"""
+import argparse
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List
+
+from sqlalchemy import delete, insert
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from app.crud.borrowed_books import crud_borrowed
+from app.models.books import Book
+from app.models.borrowed_books import BorrowedBook, BorrowedBookCreate
+from app.models.users import User
+from app.utils.exceptions import LibraryException
+import app.models.authors  # noqa: F401 register every mapped class
+import app.models.categories  # noqa: F401
+
+
+def _setup(engine: Engine, borrowers: int, copies: int):
+    run_id = uuid.uuid4().hex[:12]
+    with Session(engine) as db:
+        book_id = db.execute(
+            insert(Book).returning(Book.id),
+            {"title": f"Benchmark {run_id}", "isbn": f"BENCH-{run_id}", "quantity": copies, "publication_year": 2000},
+        ).scalar_one()
+        user_ids = db.execute(
+            insert(User).returning(User.id),
+            [
+                {
+                    "first_name": "Bench", "last_name": str(i), "email": f"bench-{run_id}-{i}@example.com",
+                    "hashed_password": "!", "is_active": True,
+                }
+                for i in range(borrowers)
+            ],
+        ).scalars().all()
+        db.commit()
+    return book_id, user_ids
+
+
+def _cleanup(engine: Engine, book_id: int, user_ids: List[int]) -> None:
+    with Session(engine) as db:
+        db.execute(delete(BorrowedBook).where(BorrowedBook.book_id == book_id))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.execute(delete(Book).where(Book.id == book_id))
+        db.commit()
+
+
+def run_benchmark(engine: Engine, *, borrowers: int, copies: int, workers: int) -> dict:
+    book_id, user_ids = _setup(engine, borrowers, copies)
+
+    def borrow(user_id: int) -> str:
+        with Session(engine) as db:
+            try:
+                crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id))
+                return "granted"
+            except LibraryException:
+                return "rejected"
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(borrow, user_ids))
+        elapsed = time.perf_counter() - start
+
+        with Session(engine) as db:
+            counter = db.exec(select(Book.active_borrow_count).where(Book.id == book_id)).one()
+            open_loans = db.exec(
+                select(func.count(BorrowedBook.id))
+                .where(BorrowedBook.book_id == book_id, BorrowedBook.real_return_date == None)
+            ).one()
+    finally:
+        _cleanup(engine, book_id, user_ids)
+
+    granted = outcomes.count("granted")
+    return {
+        "borrowers": borrowers,
+        "copies": copies,
+        "workers": workers,
+        "granted": granted,
+        "rejected": outcomes.count("rejected"),
+        "book_counter": counter,
+        "open_loans": open_loans,
+        "correct": granted == counter == open_loans == min(copies, borrowers),
+        "seconds": round(elapsed, 3),
+        "borrows_per_second": round(borrowers / elapsed, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Concurrent borrowers racing for one title")
+    parser.add_argument("--borrowers", type=int, default=300)
+    parser.add_argument("--copies", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=32, help="Concurrent sessions, keep below the pool size")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(engine, borrowers=args.borrowers, copies=args.copies, workers=args.workers)
+    print(json.dumps(result, indent=2))
+    if not result["correct"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
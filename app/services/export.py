@@ -0,0 +1,141 @@
+# app/services/export.py
+"""Streaming CSV / NDJSON exports of the catalogue and the loan history.
+
+Each export is one ordered query read through a server-side cursor
+(yield_per), encoded and sent one batch at a time, so memory stays flat
+however many rows the table holds.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.config import get_settings
+from app.models.authors import Author
+from app.models.books import Book, BookAuthorLink, BookCategoryLink
+from app.models.borrowed_books import BorrowedBook
+
+settings = get_settings()
+
+FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# ";" is also what the book importer splits author_ids / category_ids on
+CSV_LIST_SEPARATOR = ";"
+
+
+def _books_statement():
+    # ARRAY(subquery) per book, probed through the link tables' primary keys
+    author_ids = func.array(
+        select(BookAuthorLink.author_id)
+        .where(BookAuthorLink.book_id == Book.id)
+        .order_by(BookAuthorLink.author_id)
+        .scalar_subquery()
+    )
+    category_ids = func.array(
+        select(BookCategoryLink.category_id)
+        .where(BookCategoryLink.book_id == Book.id)
+        .order_by(BookCategoryLink.category_id)
+        .scalar_subquery()
+    )
+    return select(
+        Book.id, Book.isbn, Book.title, Book.publication_year, Book.quantity,
+        author_ids.label("author_ids"),
+        category_ids.label("category_ids"),
+        Book.created_at, Book.updated_at,
+    ).order_by(Book.id)
+
+
+def _authors_statement():
+    return select(
+        Author.id, Author.first_name, Author.last_name, Author.biography, Author.created_at, Author.updated_at
+    ).order_by(Author.id)
+
+
+def _borrowed_books_statement():
+    return select(
+        BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id,
+        BorrowedBook.borrowed_date, BorrowedBook.return_date, BorrowedBook.real_return_date,
+    ).order_by(BorrowedBook.id)
+
+
+EXPORTS = {
+    "books": _books_statement,
+    "authors": _authors_statement,
+    "borrowed_books": _borrowed_books_statement,
+}
+
+
+def export_batches(db: Session, kind: str, *, batch_size: int) -> Iterator[Sequence]:
+    """Column names first, then lists of rows as the cursor hands them over."""
+    result = db.execute(EXPORTS[kind]().execution_options(yield_per=batch_size))
+    yield list(result.keys())
+    for batch in result.partitions():
+        yield batch
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return CSV_LIST_SEPARATOR.join(str(item) for item in value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_csv(batches: Iterator[Sequence]) -> Iterator[str]:
+    columns = next(batches)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def encode_ndjson(batches: Iterator[Sequence]) -> Iterator[str]:
+    columns = next(batches)
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch
+        )
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+def gzip_chunks(chunks: Iterable[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk.encode("utf-8"))
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(
+        db: Session, kind: str, fmt: str, *, gzip: bool = False, batch_size: Optional[int] = None
+) -> Iterator:
+    batches = export_batches(db, kind, batch_size=batch_size or settings.EXPORT_BATCH_SIZE)
+    chunks = (chunk for chunk in ENCODERS[fmt](batches) if chunk)
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def export_headers(kind: str, fmt: str, *, gzip: bool = False) -> Dict[str, str]:
+    filename = f"{kind}.{fmt}" + (".gz" if gzip else "")
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def media_type(fmt: str, *, gzip: bool = False) -> str:
+    return "application/gzip" if gzip else FORMATS[fmt]
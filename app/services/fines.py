@@ -0,0 +1,256 @@
+# app/services/fines.py
+"""Overdue detection and fines, computed per chunk with NumPy.
+
+Open loans are read in id order, CHUNK_SIZE rows per query and only the
+columns needed; due dates, days overdue and fines are then computed for
+the whole chunk as array operations and upserted into the fine ledger.
+Run nightly: python -m app.services.fines
+
+Returned loans leave the nightly scan, return_book settles their final
+fine up to the return date through settle_fine.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Float, Integer, bindparam, cast
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlmodel import Session, func, select
+
+from app.config import get_settings
+from app.models.borrowed_books import BorrowedBook
+from app.models.fines import Fine, FineAssessmentReport, OverdueLoan, UserFineTotal
+from app.utils.pagination import paginate_sorted
+
+settings = get_settings()
+
+CHUNK_SIZE = 50000
+SECONDS_PER_DAY = 86400
+
+
+def _epoch(column):
+    return cast(func.extract("epoch", column), Float)
+
+
+def _utc_now() -> datetime:
+    # borrowed_book stores naive UTC timestamps
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    if value is None:
+        return np.nan
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def compute_fines(
+        borrowed_at: np.ndarray, return_by: np.ndarray, as_of: float,
+        *, duration_days: int, rate: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Due dates, whole days overdue and fines for arrays of epoch seconds.
+
+    return_by is NaN where the loan has no agreed return date, those are
+    due duration_days after borrowing.
+    """
+    due = np.where(np.isnan(return_by), borrowed_at + duration_days * SECONDS_PER_DAY, return_by)
+    days_overdue = np.maximum(np.floor((as_of - due) / SECONDS_PER_DAY), 0).astype(np.int64)
+    fines = np.round(days_overdue * rate, 2)
+    return due, days_overdue, fines
+
+
+def _on_conflict_refresh(upsert):
+    # One ledger row per loan, a later assessment replaces the amount
+    return upsert.on_conflict_do_update(
+        index_elements=[Fine.borrowed_book_id],
+        set_={
+            "due_date": upsert.excluded.due_date,
+            "days_overdue": upsert.excluded.days_overdue,
+            "amount": upsert.excluded.amount,
+            "assessed_at": upsert.excluded.assessed_at,
+        },
+    )
+
+
+def settle_fine(db: Session, loan) -> None:
+    """Write the final fine of a just returned loan, in the caller's transaction.
+
+    loan carries the borrowed_book columns id, user_id, book_id,
+    borrowed_date, return_date and real_return_date.
+    """
+    due, days_overdue, fines = compute_fines(
+        np.array([_timestamp(loan.borrowed_date)]), np.array([_timestamp(loan.return_date)]),
+        _timestamp(loan.real_return_date),
+        duration_days=settings.BORROW_DURATION_DAYS, rate=settings.OVERDUE_FINE_RATE,
+    )
+    if not days_overdue[0]:
+        return
+    db.execute(_on_conflict_refresh(pg_insert(Fine.__table__).values(
+        borrowed_book_id=loan.id, user_id=loan.user_id, book_id=loan.book_id,
+        due_date=datetime.fromtimestamp(due[0], timezone.utc).replace(tzinfo=None),
+        days_overdue=int(days_overdue[0]), amount=float(fines[0]), assessed_at=loan.real_return_date,
+    )))
+
+
+def _open_loans_chunk(db: Session, after_id: int, chunk_size: int):
+    statement = (
+        select(
+            BorrowedBook.id, BorrowedBook.user_id, BorrowedBook.book_id,
+            _epoch(BorrowedBook.borrowed_date), _epoch(BorrowedBook.return_date),
+        )
+        .where(BorrowedBook.real_return_date == None, BorrowedBook.id > after_id)
+        .order_by(BorrowedBook.id)
+        .limit(chunk_size)
+    )
+    return db.exec(statement).all()
+
+
+def assess_fines(
+        db: Session, *, as_of: Optional[datetime] = None, chunk_size: int = CHUNK_SIZE
+) -> FineAssessmentReport:
+    if as_of is not None and as_of.tzinfo is not None:
+        as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+    as_of = as_of or _utc_now()
+    as_of_epoch = _timestamp(as_of)
+    report = FineAssessmentReport()
+    start = time.perf_counter()
+    after_id = 0
+
+    # Each chunk is written with one INSERT ... SELECT FROM unnest(arrays),
+    # the overdue rows never become Python dicts
+    assessed = func.unnest(
+        bindparam("loan_ids", type_=ARRAY(Integer)),
+        bindparam("user_ids", type_=ARRAY(Integer)),
+        bindparam("book_ids", type_=ARRAY(Integer)),
+        bindparam("due", type_=ARRAY(Float)),
+        bindparam("days_overdue", type_=ARRAY(Integer)),
+        bindparam("amounts", type_=ARRAY(Float)),
+    ).table_valued(
+        "borrowed_book_id", "user_id", "book_id", "due", "days_overdue", "amount"
+    ).render_derived()
+    upsert = pg_insert(Fine.__table__).from_select(
+        ["borrowed_book_id", "user_id", "book_id", "due_date", "days_overdue", "amount", "assessed_at"],
+        select(
+            assessed.c.borrowed_book_id, assessed.c.user_id, assessed.c.book_id,
+            func.timezone("UTC", func.to_timestamp(assessed.c.due)),
+            assessed.c.days_overdue, assessed.c.amount, bindparam("assessed_at"),
+        ),
+    )
+    upsert = _on_conflict_refresh(upsert)
+
+    while True:
+        rows = _open_loans_chunk(db, after_id, chunk_size)
+        if not rows:
+            break
+        ids, user_ids, book_ids, borrowed_at, return_by = zip(*rows)
+        after_id = ids[-1]
+        report.scanned += len(ids)
+
+        due, days_overdue, fines = compute_fines(
+            np.array(borrowed_at, dtype=float), np.array(return_by, dtype=float), as_of_epoch,
+            duration_days=settings.BORROW_DURATION_DAYS, rate=settings.OVERDUE_FINE_RATE,
+        )
+        overdue = np.flatnonzero(days_overdue > 0)
+        if not len(overdue):
+            continue
+
+        db.execute(upsert, {
+            "loan_ids": np.array(ids)[overdue].tolist(),
+            "user_ids": np.array(user_ids)[overdue].tolist(),
+            "book_ids": np.array(book_ids)[overdue].tolist(),
+            "due": due[overdue].tolist(),
+            "days_overdue": days_overdue[overdue].tolist(),
+            "amounts": fines[overdue].tolist(),
+            "assessed_at": as_of,
+        })
+        db.commit()
+        report.overdue += len(overdue)
+        report.total_fines += float(fines[overdue].sum())
+
+    report.total_fines = round(report.total_fines, 2)
+    report.seconds = round(time.perf_counter() - start, 3)
+    return report
+
+
+def overdue_cursor_key(loan: OverdueLoan) -> str:
+    # Naive UTC like the column, so the keyset comparison is exact
+    return loan.due_date.astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def get_overdue(
+        db: Session, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+        user_id: Optional[int] = None
+) -> List[OverdueLoan]:
+    """Open loans past their due date right now, longest overdue first, with the fine accrued so far."""
+    now = _utc_now()
+    # Filtered and ordered like the partial index ix_borrowed_book_open_due_date,
+    # which is walked in order and stops at the limit
+    statement = select(BorrowedBook).where(
+        BorrowedBook.real_return_date == None,
+        BorrowedBook.return_date <= now - timedelta(days=1),
+    )
+    if user_id is not None:
+        statement = statement.where(BorrowedBook.user_id == user_id)
+    loans = db.exec(paginate_sorted(
+        statement, BorrowedBook.return_date, BorrowedBook.id,
+        parse_key=datetime.fromisoformat, skip=skip, limit=limit, cursor=cursor
+    )).all()
+    if not loans:
+        return []
+
+    _, days_overdue, fines = compute_fines(
+        np.array([_timestamp(loan.borrowed_date) for loan in loans]),
+        np.array([_timestamp(loan.return_date) for loan in loans]),
+        _timestamp(now),
+        duration_days=settings.BORROW_DURATION_DAYS, rate=settings.OVERDUE_FINE_RATE,
+    )
+    return [
+        OverdueLoan(
+            **loan.model_dump(),
+            due_date=loan.return_date.replace(tzinfo=timezone.utc),
+            days_overdue=days,
+            fine=fine,
+        )
+        for loan, days, fine in zip(loans, days_overdue.tolist(), fines.tolist())
+    ]
+
+
+def get_fine_totals(
+        db: Session, *, limit: int = 100, user_id: Optional[int] = None
+) -> List[UserFineTotal]:
+    statement = (
+        select(Fine.user_id, func.count(Fine.id), func.sum(Fine.amount))
+        .group_by(Fine.user_id)
+        .order_by(func.sum(Fine.amount).desc(), Fine.user_id)
+        .limit(limit)
+    )
+    if user_id is not None:
+        statement = statement.where(Fine.user_id == user_id)
+    return [
+        UserFineTotal(user_id=row_user_id, loans=loans, total_fines=round(total, 2))
+        for row_user_id, loans, total in db.exec(statement).all()
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.db.database import engine
+    import app.models.authors  # noqa: F401 register every mapped class
+    import app.models.categories  # noqa: F401
+    import app.models.users  # noqa: F401
+
+    parser = argparse.ArgumentParser(description="Assess fines for overdue loans")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="UTC timestamp, defaults to now")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with Session(engine) as session:
+        report = assess_fines(session, as_of=args.as_of, chunk_size=args.chunk_size)
+    print(json.dumps(report.model_dump(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
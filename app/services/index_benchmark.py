@@ -0,0 +1,148 @@
+# app/services/index_benchmark.py
+"""Query plans of the hot borrow queries with and without the borrowed_book indexes.
+
+Seeds a synthetic loan history, then runs EXPLAIN ANALYZE on each query
+twice: once with the indexes dropped inside a transaction that is rolled
+back, once with them in place. The rollback restores the indexes, but the
+DROP holds an exclusive lock on borrowed_book until then, so point it at a
+development database:
+
+    python -m app.services.index_benchmark --loans 200000
+"""
+import argparse
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, delete, insert, inspect, null, text
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, func, select
+
+from app.models.books import Book
+from app.models.borrowed_books import BorrowedBook
+from app.models.users import User
+import app.models.authors  # noqa: F401 register every mapped class
+import app.models.categories  # noqa: F401
+
+INDEXES = [index.name for index in BorrowedBook.__table__.indexes]
+
+
+def hot_queries(user_id: int, book_id: int) -> Dict[str, object]:
+    """The borrowed_book lookups behind availability, loan lists, reconcile and fines."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return {
+        "open_loans_of_book": select(func.count(BorrowedBook.id)).where(
+            BorrowedBook.book_id == book_id, BorrowedBook.real_return_date == None
+        ),
+        "loans_of_book": select(BorrowedBook).where(BorrowedBook.book_id == book_id)
+        .order_by(BorrowedBook.id).limit(100),
+        "loans_of_user": select(BorrowedBook).where(BorrowedBook.user_id == user_id)
+        .order_by(BorrowedBook.id).limit(100),
+        "recent_loans_of_user": select(BorrowedBook).where(
+            BorrowedBook.user_id == user_id, BorrowedBook.borrowed_date >= now - timedelta(days=30)
+        ),
+        "open_loans_of_user": select(func.count(BorrowedBook.id)).where(
+            BorrowedBook.user_id == user_id, BorrowedBook.real_return_date == None
+        ),
+        "overdue_loans": select(BorrowedBook).where(
+            BorrowedBook.real_return_date == None, BorrowedBook.return_date <= now - timedelta(days=1)
+        ).order_by(BorrowedBook.return_date, BorrowedBook.id).limit(100),
+    }
+
+
+def _seed(engine: Engine, *, loans: int, users: int, books: int):
+    run_id = uuid.uuid4().hex[:12]
+    with Session(engine) as db:
+        book_ids = db.execute(
+            insert(Book).returning(Book.id),
+            [
+                {"title": f"Index benchmark {run_id} {i}", "isbn": f"IDX-{run_id}-{i}", "quantity": 1,
+                 "publication_year": 2000}
+                for i in range(books)
+            ],
+        ).scalars().all()
+        user_ids = db.execute(
+            insert(User).returning(User.id),
+            [
+                {"first_name": "Index", "last_name": str(i), "email": f"idx-{run_id}-{i}@example.com",
+                 "hashed_password": "!", "is_active": True}
+                for i in range(users)
+            ],
+        ).scalars().all()
+
+        # Loans spread over two years, one in ten still open
+        n = func.generate_series(0, loans - 1).column_valued("n")
+        borrowed = func.now() - (n % 730) * text("interval '1 day'")
+        db.execute(insert(BorrowedBook).from_select(
+            ["user_id", "book_id", "borrowed_date", "return_date", "real_return_date"],
+            select(
+                array(user_ids)[n % len(user_ids) + 1],
+                array(book_ids)[n % len(book_ids) + 1],
+                borrowed,
+                borrowed + text("interval '14 days'"),
+                case((n % 10 == 0, null()), else_=borrowed + text("interval '10 days'")),
+            ),
+        ))
+        db.commit()
+        db.execute(text("ANALYZE borrowed_book"))
+        db.commit()
+    return book_ids, user_ids
+
+
+def _cleanup(engine: Engine, book_ids: List[int], user_ids: List[int]) -> None:
+    with Session(engine) as db:
+        db.execute(delete(BorrowedBook).where(BorrowedBook.book_id.in_(book_ids)))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.execute(delete(Book).where(Book.id.in_(book_ids)))
+        db.commit()
+
+
+def explain(connection: Connection, statement) -> dict:
+    compiled = statement.compile(dialect=connection.dialect)
+    lines = connection.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", compiled.params
+    ).scalars().all()
+    execution_ms = float(lines[-1].split(":")[1].split()[0])
+    return {"execution_ms": execution_ms, "plan": lines}
+
+
+def run_benchmark(engine: Engine, *, loans: int, users: int, books: int) -> dict:
+    existing = {index["name"] for index in inspect(engine).get_indexes(BorrowedBook.__tablename__)}
+    missing = [name for name in INDEXES if name not in existing]
+    if missing:
+        raise RuntimeError(f"Run the migrations first, missing indexes: {', '.join(missing)}")
+    book_ids, user_ids = _seed(engine, loans=loans, users=users, books=books)
+    try:
+        queries = hot_queries(user_ids[0], book_ids[0])
+        results = {name: {} for name in queries}
+        with engine.connect() as connection:
+            with connection.begin() as transaction:
+                for name in INDEXES:
+                    connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                for name, statement in queries.items():
+                    results[name]["before"] = explain(connection, statement)
+                transaction.rollback()
+            for name, statement in queries.items():
+                results[name]["after"] = explain(connection, statement)
+    finally:
+        _cleanup(engine, book_ids, user_ids)
+    return {"loans": loans, "users": users, "books": books, "indexes": INDEXES, "queries": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="EXPLAIN the hot borrow queries with and without indexes")
+    parser.add_argument("--loans", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--books", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(engine, loans=args.loans, users=args.users, books=args.books)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
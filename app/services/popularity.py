@@ -0,0 +1,207 @@
+# app/services/popularity.py
+"""Borrow counter rollups behind the /api/stats popularity endpoints.
+
+Counters move in the caller's transaction: CRUDBorrowedBook on every
+borrow, CRUDBook when a book's authors/categories change or the book is
+deleted. All-time counts come from the per-entity rollups, date windows
+from the daily per-book buckets. rebuild_rollups recomputes everything
+from borrowed_book and is the repair job: python -m app.services.popularity
+"""
+from datetime import date, datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, func, select
+
+from app.models.authors import Author
+from app.models.books import Book, BookAuthorLink, BookCategoryLink
+from app.models.borrowed_books import BorrowedBook
+from app.models.categories import Category
+from app.models.stats import AuthorBorrowStats, BookBorrowDaily, BookBorrowStats, CategoryBorrowStats
+
+# (rollup model, its key column, link model, link column)
+LINKED_ROLLUPS = (
+    (AuthorBorrowStats, AuthorBorrowStats.author_id, BookAuthorLink, BookAuthorLink.author_id),
+    (CategoryBorrowStats, CategoryBorrowStats.category_id, BookCategoryLink, BookCategoryLink.category_id),
+)
+
+
+def _upsert(rollup_model, key_column, statement, *extra_keys):
+    # INSERT ... ON CONFLICT adds to the counter, so concurrent borrows of
+    # the same book never overwrite each other
+    return statement.on_conflict_do_update(
+        index_elements=[*extra_keys, key_column],
+        set_={"borrow_count": rollup_model.borrow_count + statement.excluded.borrow_count},
+    )
+
+
+def borrow_day(borrowed_date: datetime) -> date:
+    """The UTC day bucket of a borrow, as rebuild_rollups derives it from the stored column."""
+    if borrowed_date.tzinfo is not None:
+        borrowed_date = borrowed_date.astimezone(timezone.utc)
+    return borrowed_date.date()
+
+
+def record_borrow(db: Session, book_id: int, borrowed_on: date, delta: int = 1) -> None:
+    """Add delta to the book's counters and to each of its authors and categories."""
+    rows = pg_insert(BookBorrowStats).values(book_id=book_id, borrow_count=delta)
+    db.execute(_upsert(BookBorrowStats, BookBorrowStats.book_id, rows))
+    rows = pg_insert(BookBorrowDaily).values(day=borrowed_on, book_id=book_id, borrow_count=delta)
+    db.execute(_upsert(BookBorrowDaily, BookBorrowDaily.book_id, rows, BookBorrowDaily.day))
+    for rollup_model, key_column, link_model, link_column in LINKED_ROLLUPS:
+        rows = pg_insert(rollup_model).from_select(
+            [key_column.key, "borrow_count"],
+            select(link_column, literal(delta)).where(link_model.book_id == book_id),
+        )
+        db.execute(_upsert(rollup_model, key_column, rows))
+
+
+def lock_borrow_count(db: Session, book_id: int) -> int:
+    """Lock the book's counter row until commit and return its count.
+
+    record_borrow upserts this row before it reads the book's links, so a
+    relink that holds the lock first makes concurrent borrows wait for it
+    and credit the new links. The row is created when missing, otherwise
+    a first borrow would have nothing to wait on.
+    """
+    rows = pg_insert(BookBorrowStats).values(book_id=book_id, borrow_count=0)
+    statement = _upsert(BookBorrowStats, BookBorrowStats.book_id, rows).returning(BookBorrowStats.borrow_count)
+    return db.execute(statement).scalar_one()
+
+
+def move_link_counts(db: Session, book_id: int, link_column, target_ids: Iterable[int], sign: int) -> None:
+    """Credit (sign=1) or debit (sign=-1) the book's borrows to linked authors/categories.
+
+    Callers take lock_borrow_count before changing the links.
+    """
+    target_ids = list(target_ids)
+    if not target_ids:
+        return
+    borrow_count = lock_borrow_count(db, book_id)
+    if not borrow_count:
+        return
+    rollup_model, key_column = next(
+        (rollup_model, key_column) for rollup_model, key_column, _, column in LINKED_ROLLUPS
+        if column is link_column
+    )
+    rows = pg_insert(rollup_model).values(
+        [{key_column.key: target_id, "borrow_count": sign * borrow_count} for target_id in target_ids]
+    )
+    db.execute(_upsert(rollup_model, key_column, rows))
+
+
+def forget_book(db: Session, book_id: int) -> None:
+    """Debit a book that is about to be deleted from its authors and categories."""
+    lock_borrow_count(db, book_id)
+    for _, _, link_model, link_column in LINKED_ROLLUPS:
+        linked = db.exec(select(link_column).where(link_model.book_id == book_id)).all()
+        move_link_counts(db, book_id, link_column, linked, -1)
+
+
+def top_books(db: Session, limit: int, window: Optional[Tuple[date, date]] = None) -> List[tuple]:
+    if window is None:
+        # Top-N over the borrow_count index of the rollup, not over borrow history
+        statement = (
+            select(Book.title, BookBorrowStats.borrow_count)
+            .join(Book, Book.id == BookBorrowStats.book_id)
+            .where(BookBorrowStats.borrow_count > 0)
+            .order_by(BookBorrowStats.borrow_count.desc())
+        )
+    else:
+        borrow_count = func.sum(BookBorrowDaily.borrow_count)
+        statement = (
+            select(Book.title, borrow_count)
+            .join(Book, Book.id == BookBorrowDaily.book_id)
+            .where(BookBorrowDaily.day.between(*window))
+            .group_by(Book.id)
+            .having(borrow_count > 0)
+            .order_by(borrow_count.desc())
+        )
+    return db.exec(statement.limit(limit)).all()
+
+
+def top_authors(db: Session, limit: int, window: Optional[Tuple[date, date]] = None) -> List[tuple]:
+    if window is None:
+        statement = (
+            select(Author.first_name, Author.last_name, AuthorBorrowStats.borrow_count)
+            .join(Author, Author.id == AuthorBorrowStats.author_id)
+            .where(AuthorBorrowStats.borrow_count > 0)
+            .order_by(AuthorBorrowStats.borrow_count.desc())
+        )
+    else:
+        borrow_count = func.sum(BookBorrowDaily.borrow_count)
+        statement = (
+            select(Author.first_name, Author.last_name, borrow_count)
+            .join(BookAuthorLink, BookAuthorLink.book_id == BookBorrowDaily.book_id)
+            .join(Author, Author.id == BookAuthorLink.author_id)
+            .where(BookBorrowDaily.day.between(*window))
+            .group_by(Author.id)
+            .having(borrow_count > 0)
+            .order_by(borrow_count.desc())
+        )
+    return db.exec(statement.limit(limit)).all()
+
+
+def top_categories(db: Session, limit: int, window: Optional[Tuple[date, date]] = None) -> List[tuple]:
+    if window is None:
+        statement = (
+            select(Category.name, CategoryBorrowStats.borrow_count)
+            .join(Category, Category.id == CategoryBorrowStats.category_id)
+            .where(CategoryBorrowStats.borrow_count > 0)
+            .order_by(CategoryBorrowStats.borrow_count.desc())
+        )
+    else:
+        borrow_count = func.sum(BookBorrowDaily.borrow_count)
+        statement = (
+            select(Category.name, borrow_count)
+            .join(BookCategoryLink, BookCategoryLink.book_id == BookBorrowDaily.book_id)
+            .join(Category, Category.id == BookCategoryLink.category_id)
+            .where(BookBorrowDaily.day.between(*window))
+            .group_by(Category.id)
+            .having(borrow_count > 0)
+            .order_by(borrow_count.desc())
+        )
+    return db.exec(statement.limit(limit)).all()
+
+
+def rebuild_rollups(db: Session) -> None:
+    db.execute(delete(BookBorrowStats))
+    db.execute(
+        insert(BookBorrowStats).from_select(
+            ["book_id", "borrow_count"],
+            select(BorrowedBook.book_id, func.count()).group_by(BorrowedBook.book_id),
+        )
+    )
+    borrowed_on = func.date(BorrowedBook.borrowed_date)
+    db.execute(delete(BookBorrowDaily))
+    db.execute(
+        insert(BookBorrowDaily).from_select(
+            ["day", "book_id", "borrow_count"],
+            select(borrowed_on, BorrowedBook.book_id, func.count()).group_by(borrowed_on, BorrowedBook.book_id),
+        )
+    )
+    for rollup_model, key_column, link_model, link_column in LINKED_ROLLUPS:
+        db.execute(delete(rollup_model))
+        db.execute(
+            insert(rollup_model).from_select(
+                [key_column.key, "borrow_count"],
+                select(link_column, func.sum(BookBorrowStats.borrow_count))
+                .join(BookBorrowStats, BookBorrowStats.book_id == link_model.book_id)
+                .group_by(link_column),
+            )
+        )
+    db.commit()
+
+
+def main() -> None:
+    from app.db.database import engine
+    import app.models.users  # noqa: F401 register every mapped class
+
+    with Session(engine) as session:
+        rebuild_rollups(session)
+    print("Rebuilt borrow rollups")
+
+
+if __name__ == "__main__":
+    main()
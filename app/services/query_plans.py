@@ -0,0 +1,347 @@
+# app/services/query_plans.py
+"""Query-plan regression check for the CRUD and stats queries.
+
+Seeds a deterministic dataset, runs every case below while capturing the
+SELECTs it sends, and re-runs each of them under EXPLAIN (ANALYZE,
+BUFFERS). A case fails when the shape of one of its plans differs from
+the fingerprint saved in query_plans.json, or when its plans read more
+rows than the case's budget. The data lives in a scratch schema that is
+dropped afterwards.
+
+    python -m app.services.query_plans                # check
+    python -m app.services.query_plans --update       # save new fingerprints
+    python -m app.services.query_plans --database-url postgresql://...
+
+Plan shapes depend on the server version and its planner settings,
+regenerate the fingerprints with --update when moving to another server.
+"""
+import argparse
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import case, create_engine, event, insert, null, text
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel, func, select
+
+from app.crud.books import crud_books
+from app.crud.borrowed_books import crud_borrowed
+from app.crud.users import crud_users
+from app.models.authors import Author
+from app.models.books import Book, BookAuthorLink, BookCategoryLink
+from app.models.borrowed_books import BorrowedBook
+from app.models.categories import Category
+from app.models.users import User
+from app.services import fines, popularity
+
+BASELINE_PATH = Path(__file__).with_name("query_plans.json")
+SCHEMA = "query_plan_check"
+
+BOOKS = 20000
+AUTHORS = 4000
+CATEGORIES = 60
+USERS = 5000
+LOANS = 100000
+TITLE_WORDS = (
+    "river", "shadow", "garden", "winter", "empire", "silence", "harbor", "machine",
+    "letters", "orchard", "storm", "atlas", "mirror", "tide", "lantern", "voyage",
+)
+
+
+@dataclass
+class Dataset:
+    book_ids: List[int]
+    author_ids: List[int]
+    category_ids: List[int]
+    user_ids: List[int]
+
+
+@dataclass
+class PlanCase:
+    name: str
+    run: Callable[[Session, Dataset], object]
+    # Rows read by every scan node of every plan of the case, summed
+    max_rows_examined: int
+    # Extensions that add indexes to the plan. Each installed one becomes
+    # part of the baseline key, e.g. "books.search_books.title[pg_trgm]",
+    # so servers with and without it are checked against their own plans
+    extensions: Tuple[str, ...] = ()
+
+    def key(self, installed: Set[str]) -> str:
+        return self.name + "".join(f"[{name}]" for name in self.extensions if name in installed)
+
+
+@dataclass
+class PlanResult:
+    name: str
+    fingerprints: List[str]
+    rows_examined: int
+    max_rows_examined: int
+    problems: List[str] = field(default_factory=list)
+
+
+def _last_30_days() -> Tuple[date, date]:
+    today = date.today()
+    return today - timedelta(days=29), today
+
+
+CASES = [
+    PlanCase("books.get_by_isbn", lambda db, d: crud_books.get_by_isbn(db, "PLAN-77"), 10),
+    PlanCase("books.get_multi", lambda db, d: crud_books.get_multi(db, limit=50), 200),
+    PlanCase(
+        "books.search_books.title",
+        lambda db, d: crud_books.search_books(db, title="lantern", limit=50), 2000, extensions=("pg_trgm",)
+    ),
+    PlanCase(
+        "books.search_books.author",
+        lambda db, d: crud_books.search_books(db, author_id=d.author_ids[7], limit=50), 100
+    ),
+    PlanCase(
+        "books.search_books.category",
+        lambda db, d: crud_books.search_books(db, category_id=d.category_ids[3], limit=50), 4000
+    ),
+    PlanCase(
+        "books.search_books.expand",
+        lambda db, d: crud_books.search_books(db, limit=50, expand=("authors", "categories")), 1000
+    ),
+    PlanCase("books.search_fulltext", lambda db, d: crud_books.search_fulltext(db, q="garden 1234", limit=20), 100),
+    PlanCase("users.get_by_email", lambda db, d: crud_users.get_by_email(db, "plan-42@example.com"), 10),
+    PlanCase("users.get_active", lambda db, d: crud_users.get_active(db, limit=50), 200),
+    PlanCase("borrowed_books.get_by_user", lambda db, d: crud_borrowed.get_by_user(db, d.user_ids[11]), 200),
+    PlanCase(
+        "borrowed_books.get_multi.book",
+        lambda db, d: crud_borrowed.get_multi(db, book_id=d.book_ids[5], limit=50), 200
+    ),
+    PlanCase("fines.get_overdue", lambda db, d: fines.get_overdue(db, limit=50), 200),
+    PlanCase("stats.popular_books", lambda db, d: popularity.top_books(db, 10), 1000),
+    PlanCase("stats.popular_authors", lambda db, d: popularity.top_authors(db, 10), 1000),
+    PlanCase("stats.popular_categories", lambda db, d: popularity.top_categories(db, 10), 1000),
+    PlanCase("stats.popular_books.window", lambda db, d: popularity.top_books(db, 10, _last_30_days()), 40000),
+    PlanCase("stats.popular_authors.window", lambda db, d: popularity.top_authors(db, 10, _last_30_days()), 50000),
+    PlanCase(
+        "stats.popular_categories.window", lambda db, d: popularity.top_categories(db, 10, _last_30_days()), 40000
+    ),
+]
+
+
+@contextmanager
+def scratch_schema(engine: Engine) -> Iterator[Engine]:
+    """An engine whose search_path is a freshly created, empty copy of the schema.
+
+    Every run starts from the same physical layout, so plans do not drift
+    with leftovers of earlier runs, and the real tables are never touched.
+    public stays on the path for the extensions installed there (pg_trgm),
+    the models declare every index the migrations create. create_all skips
+    its existence check, which would otherwise find the public tables
+    through the path and leave the scratch schema empty.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.exec_driver_sql(f"CREATE SCHEMA {SCHEMA}")
+    scratch = create_engine(engine.url, poolclass=NullPool, connect_args={"options": f"-csearch_path={SCHEMA},public"})
+    try:
+        SQLModel.metadata.create_all(scratch, checkfirst=False)
+        yield scratch
+    finally:
+        scratch.dispose()
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+def seed(engine: Engine) -> Dataset:
+    with Session(engine) as db:
+        category_ids = db.execute(
+            insert(Category).returning(Category.id),
+            [{"name": f"Category {i}"} for i in range(CATEGORIES)],
+        ).scalars().all()
+        author_ids = db.execute(
+            insert(Author).returning(Author.id),
+            [{"first_name": TITLE_WORDS[i % len(TITLE_WORDS)].title(), "last_name": f"Author {i}"} for i in range(AUTHORS)],
+        ).scalars().all()
+        book_ids = db.execute(
+            insert(Book).returning(Book.id),
+            [
+                {
+                    "title": f"{TITLE_WORDS[i % len(TITLE_WORDS)]} {TITLE_WORDS[i * 7 % len(TITLE_WORDS)]} {i}",
+                    "isbn": f"PLAN-{i}", "quantity": 3, "publication_year": 1900 + i % 120,
+                }
+                for i in range(BOOKS)
+            ],
+        ).scalars().all()
+        db.execute(insert(BookAuthorLink), [
+            {"book_id": book_id, "author_id": author_ids[i % AUTHORS]} for i, book_id in enumerate(book_ids)
+        ])
+        db.execute(insert(BookCategoryLink), [
+            {"book_id": book_id, "category_id": category_ids[i % CATEGORIES]} for i, book_id in enumerate(book_ids)
+        ])
+        user_ids = db.execute(
+            insert(User).returning(User.id),
+            [
+                {"first_name": "Plan", "last_name": str(i), "email": f"plan-{i}@example.com",
+                 "hashed_password": "!", "is_active": i % 20 != 0}
+                for i in range(USERS)
+            ],
+        ).scalars().all()
+
+        # Two years of loans, one in ten still open
+        n = func.generate_series(0, LOANS - 1).column_valued("n")
+        borrowed = func.now() - (n % 730) * text("interval '1 day'")
+        db.execute(insert(BorrowedBook).from_select(
+            ["user_id", "book_id", "borrowed_date", "return_date", "real_return_date"],
+            select(
+                array(user_ids)[n % USERS + 1],
+                array(book_ids)[n * 31 % BOOKS + 1],
+                borrowed,
+                borrowed + text("interval '14 days'"),
+                case((n % 10 == 0, null()), else_=borrowed + text("interval '10 days'")),
+            ),
+        ))
+        crud_books.refresh_search_vector(db, book_ids=book_ids)
+        db.commit()
+        popularity.rebuild_rollups(db)
+    # Planner statistics must reflect the seeded rows, VACUUM also flushes
+    # the GIN pending list the bulk insert left behind, as autovacuum would
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            connection.exec_driver_sql(f'VACUUM ANALYZE "{table.name}"')
+    return Dataset(book_ids, author_ids, category_ids, user_ids)
+
+
+@contextmanager
+def capture_selects(engine: Engine) -> Iterator[List[Tuple[str, object]]]:
+    captured: List[Tuple[str, object]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield captured
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def fingerprint(node: dict) -> str:
+    """Plan shape without costs or row counts, e.g. Limit(Index Scan on book using book_pkey)."""
+    label = node["Node Type"]
+    if node.get("Parallel Aware"):
+        label = f"Parallel {label}"
+    if node.get("Strategy") and node["Node Type"] == "Aggregate":
+        label = f"{node['Strategy']} {label}"
+    if node.get("Relation Name"):
+        label += f" on {node['Relation Name']}"
+    if node.get("Index Name"):
+        label += f" using {node['Index Name']}"
+    children = node.get("Plans", [])
+    if children:
+        label += "(" + ", ".join(fingerprint(child) for child in children) + ")"
+    return label
+
+
+def rows_examined(node: dict) -> int:
+    """Rows produced or filtered out by the scan nodes of a plan."""
+    rows = 0
+    if node.get("Relation Name"):
+        per_loop = (
+            node.get("Actual Rows", 0)
+            + node.get("Rows Removed by Filter", 0)
+            + node.get("Rows Removed by Index Recheck", 0)
+        )
+        rows += int(per_loop * node.get("Actual Loops", 1))
+    return rows + sum(rows_examined(child) for child in node.get("Plans", []))
+
+
+def explain_case(engine: Engine, case_: PlanCase, dataset: Dataset) -> Tuple[List[str], int]:
+    with Session(engine) as db:
+        with capture_selects(engine) as captured:
+            case_.run(db, dataset)
+        fingerprints, total_rows = [], 0
+        connection = db.connection()
+        for statement, parameters in captured:
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters
+            ).scalar_one()[0]["Plan"]
+            fingerprints.append(fingerprint(plan))
+            total_rows += rows_examined(plan)
+        db.rollback()
+    # Sorted, the order relationship loaders run in is not part of the shape
+    return sorted(fingerprints), total_rows
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, List[str]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def check_plans(
+        engine: Engine, *, cases: Optional[List[PlanCase]] = None, baseline: Optional[Dict[str, List[str]]] = None
+) -> List[PlanResult]:
+    cases = CASES if cases is None else cases
+    baseline = load_baseline() if baseline is None else baseline
+    results = []
+    with scratch_schema(engine) as scratch:
+        with scratch.connect() as connection:
+            installed = set(connection.exec_driver_sql("SELECT extname FROM pg_extension").scalars())
+        dataset = seed(scratch)
+        for case_ in cases:
+            fingerprints, total_rows = explain_case(scratch, case_, dataset)
+            result = PlanResult(case_.key(installed), fingerprints, total_rows, case_.max_rows_examined)
+            expected = baseline.get(result.name)
+            if expected is None:
+                result.problems.append("no saved plan fingerprint")
+            elif expected != fingerprints:
+                result.problems.append(
+                    "plan changed shape:\n  saved:  " + "\n          ".join(expected)
+                    + "\n  actual: " + "\n          ".join(fingerprints)
+                )
+            if total_rows > case_.max_rows_examined:
+                result.problems.append(f"examined {total_rows} rows, budget is {case_.max_rows_examined}")
+            results.append(result)
+    return results
+
+
+def save_baseline(results: List[PlanResult], path: Path = BASELINE_PATH) -> None:
+    # Plans recorded for other extension sets of the same cases are kept
+    order = [result.name.split("[")[0] for result in results]
+    baseline = {key: plans for key, plans in load_baseline(path).items() if key.split("[")[0] in order}
+    baseline.update({result.name: result.fingerprints for result in results})
+    baseline = dict(sorted(baseline.items(), key=lambda item: (order.index(item[0].split("[")[0]), item[0])))
+    path.write_text(json.dumps(baseline, indent=2) + "\n", encoding="utf-8")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Check query plans of the CRUD and stats queries")
+    parser.add_argument("--database-url", help="Defaults to the application database")
+    parser.add_argument("--update", action="store_true", help="Save the current plans as the new fingerprints")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        from app.db.database import engine
+
+    results = check_plans(engine)
+    for result in results:
+        status = "ok" if not result.problems else "FAIL"
+        print(f"{status:4} {result.name}: {result.rows_examined}/{result.max_rows_examined} rows")
+        for fingerprint_ in result.fingerprints:
+            print(f"       {fingerprint_}")
+        for problem in result.problems:
+            print(f"       {problem}")
+
+    if args.update:
+        save_baseline(results)
+        print(f"Saved {len(results)} plan fingerprints to {BASELINE_PATH}")
+    elif any(result.problems for result in results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
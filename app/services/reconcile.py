@@ -0,0 +1,40 @@
+# app/services/reconcile.py
+"""Periodic repair of denormalised counters.
+
+Run from cron or a scheduler: python -m app.services.reconcile
+
+The job clears the entity cache after a repair. That only reaches the
+server workers with ENTITY_CACHE_BACKEND=shared and an ENTITY_CACHE_URL;
+with a per-process backend each worker keeps serving the old counters
+until its entries expire (ENTITY_CACHE_TTL_SECONDS).
+"""
+from sqlmodel import Session
+
+from app.config import get_settings
+from app.crud.cache import entity_cache
+from app.db.database import engine
+from app.crud.users import crud_users
+from app.models.books import BookService
+import app.models.categories  # noqa: F401 register every mapped class
+import app.models.users  # noqa: F401
+import app.models.borrowed_books  # noqa: F401
+
+settings = get_settings()
+
+
+def main() -> None:
+    with Session(engine) as session:
+        fixed_books = BookService().reconcile_borrow_counts(session)
+        fixed_users = crud_users.reconcile_borrow_counts(session)
+    if (fixed_books or fixed_users) and entity_cache is not None:
+        entity_cache.clear()
+        if settings.ENTITY_CACHE_BACKEND.lower() != "shared" or not settings.ENTITY_CACHE_URL:
+            print(
+                f"Entity cache is per process: server workers keep cached counters "
+                f"for up to {settings.ENTITY_CACHE_TTL_SECONDS}s"
+            )
+    print(f"Reconciled borrow counters for {fixed_books} books and {fixed_users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# app/services/suggest.py
+import bisect
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlmodel import Session, func, select
+
+from app.config import get_settings
+from app.models.authors import Author
+from app.models.books import Book
+from app.models.search import Suggestion, SuggestResults
+
+settings = get_settings()
+
+AUTHOR_FULL_NAME = Author.first_name + " " + Author.last_name
+
+IndexParts = Tuple[List[str], List[int], List[Tuple[int, str]]]
+
+# (available, checked at), re-checked after the TTL so installing pg_trgm
+# does not need a restart
+_trigram_available: Optional[Tuple[bool, float]] = None
+
+
+def trigram_available(db: Session) -> bool:
+    global _trigram_available
+    checked = _trigram_available
+    if checked is None or time.monotonic() - checked[1] >= settings.SUGGEST_INDEX_TTL_SECONDS:
+        statement = text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        checked = (db.exec(statement).first() is not None, time.monotonic())
+        _trigram_available = checked
+    return checked[0]
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+class PrefixIndex:
+    """In-process word-prefix index used when pg_trgm is not installed.
+
+    Every word of a title or author name is a key, so "gard" finds
+    "Quantum Gardening". Rebuilt lazily after writes or once the TTL expires.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # kind -> (sorted word keys, entry position per key, entries), replaced
+        # as a whole so a concurrent search never mixes two builds
+        self._index: Dict[str, IndexParts] = {}
+        self._built_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        self._built_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl_seconds
+
+    @staticmethod
+    def build(entries: Iterable[Tuple[int, str]]) -> IndexParts:
+        entries = list(entries)
+        pairs = sorted(
+            (word, position)
+            for position, (_, label) in enumerate(entries)
+            for word in set(_normalize(label).split())
+        )
+        return [word for word, _ in pairs], [position for _, position in pairs], entries
+
+    def ensure_built(self, db: Session) -> None:
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            self._index = {
+                "books": self.build(db.exec(select(Book.id, Book.title)).all()),
+                "authors": self.build(db.exec(select(Author.id, AUTHOR_FULL_NAME)).all()),
+            }
+            self._built_at = time.monotonic()
+
+    def search(self, kind: str, q: str, limit: int) -> List[Suggestion]:
+        words = _normalize(q).split()
+        if not words:
+            return []
+        keys, postings, entries = self._index.get(kind, ([], [], []))
+
+        # Candidates share the longest query word as a word prefix, the rest
+        # of the words must prefix some other word of the label
+        anchor = max(words, key=len)
+        start = bisect.bisect_left(keys, anchor)
+        candidates = set()
+        for i in range(start, len(keys)):
+            if not keys[i].startswith(anchor):
+                break
+            candidates.add(postings[i])
+
+        normalized_q = " ".join(words)
+        results = []
+        for position in candidates:
+            entry_id, label = entries[position]
+            label_words = _normalize(label).split()
+            if all(any(w.startswith(word) for w in label_words) for word in words):
+                score = SequenceMatcher(None, normalized_q, _normalize(label)).ratio()
+                results.append(Suggestion(id=entry_id, label=label, score=round(score, 4)))
+        results.sort(key=lambda s: (-s.score, s.label))
+        return results[:limit]
+
+
+suggest_index = PrefixIndex(ttl_seconds=settings.SUGGEST_INDEX_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_suggest_index(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Book, Author)):
+            suggest_index.invalidate()
+            return
+
+
+def _trigram_search(db: Session, column, id_column, q: str, limit: int) -> List[Suggestion]:
+    # "column %> q" is the indexable form of word_similarity(q, column)
+    score = func.word_similarity(q, column)
+    statement = (
+        select(id_column, column, score.label("score"))
+        .where(column.op("%>")(q))
+        .order_by(score.desc(), id_column)
+        .limit(limit)
+    )
+    return [
+        Suggestion(id=row_id, label=label, score=round(row_score, 4))
+        for row_id, label, row_score in db.exec(statement).all()
+    ]
+
+
+def suggest(db: Session, q: str, *, limit: int = 10) -> SuggestResults:
+    if trigram_available(db):
+        return SuggestResults(
+            query=q,
+            source="trigram",
+            books=_trigram_search(db, Book.title, Book.id, q, limit),
+            authors=_trigram_search(db, AUTHOR_FULL_NAME, Author.id, q, limit),
+        )
+
+    suggest_index.ensure_built(db)
+    return SuggestResults(
+        query=q,
+        source="prefix",
+        books=suggest_index.search("books", q, limit),
+        authors=suggest_index.search("authors", q, limit),
+    )
@@ -2,9 +2,12 @@ import os
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, create_engine, Session, inspect
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.main import app
-from app.db.database import get_session
+from app.db.database import get_async_session, get_session, to_async_url
 
 DATABASE_TEST_URL = os.getenv("DATABASE_TEST_URL")
 
@@ -52,9 +55,20 @@ def session(engine):
     with Session(engine) as session:
         yield session
 
+@pytest.fixture(scope="session")
+def async_engine(engine):
+    # NullPool: every test runs in its own event loop, pooled asyncpg
+    # connections would be bound to a loop that is already closed
+    yield create_async_engine(to_async_url(DATABASE_TEST_URL), poolclass=NullPool)
+
 @pytest_asyncio.fixture
-async def client(session):
+async def client(session, async_engine):
+    async def get_test_async_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_async_session] = get_test_async_session
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
@@ -55,6 +55,19 @@ async def test_read_authors_pagination(client):
     assert isinstance(response.json(), list)
     assert len(response.json()) <= 2
 
+@pytest.mark.asyncio
+async def test_read_authors_cursor_pagination(client):
+    for i in range(3):
+        await client.post("/api/authors/", json=author_payload(f"Cur{i}", f"Cur{i}"))
+    first = await client.get("/api/authors/", params={"limit": 2})
+    assert first.status_code == 200
+    cursor = first.headers["X-Next-Cursor"]
+    second = await client.get("/api/authors/", params={"limit": 2, "cursor": cursor})
+    assert second.status_code == 200
+    first_ids = [a["id"] for a in first.json()]
+    second_ids = [a["id"] for a in second.json()]
+    assert second_ids and min(second_ids) > max(first_ids)
+
 # --- READ BY ID ---
 @pytest.mark.asyncio
 async def test_read_author_by_id(client):
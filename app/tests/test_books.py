@@ -1,4 +1,12 @@
+import json
+from datetime import datetime, timezone
 import pytest
+from sqlalchemy import event, update
+from sqlmodel import Session
+from app.crud.books import crud_books
+from app.crud.cache import LocalSharedStore, LRUCache, SharedCache
+from app.models.books import Book
+from app.utils.isbn_filter import ISBNFilter
 
 def author_payload(first_name="John", last_name="Doe", biography="Test bio"):
     return {
@@ -55,6 +63,69 @@ async def test_create_book_missing_fields(client):
     response = await client.post("/api/books/", json={"title": "NoISBN"})
     assert response.status_code in (400, 422)
 
+@pytest.mark.asyncio
+async def test_import_books_csv(client):
+    author = (await client.post("/api/authors/", json=author_payload("Import", "Csv"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("ImportCsvCat"))).json()
+    feed = (
+        "title,publication_year,isbn,quantity,author_ids,category_ids\n"
+        f"CsvA,2001,ISBN-CSV-A,2,{author['id']},{category['id']}\n"
+        f"CsvB,2002,ISBN-CSV-B,1,{author['id']};99999,\n"
+        "CsvC,2003,ISBN-CSV-A,1,,\n"
+    )
+    response = await client.post("/api/books/import", files={"file": ("feed.csv", feed, "text/csv")})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 1
+    assert data["failed"] == 2
+    assert [error["row"] for error in data["errors"]] == [3, 4]
+    books = (await client.get("/api/books/", params={"title": "CsvA"})).json()
+    assert [book["isbn"] for book in books] == ["ISBN-CSV-A"]
+
+@pytest.mark.asyncio
+async def test_import_books_rejected_row_keeps_isbn_free(client):
+    author = (await client.post("/api/authors/", json=author_payload("Import", "Retry"))).json()
+    feed = (
+        "title,publication_year,isbn,quantity,author_ids,category_ids\n"
+        "RetryA,2001,ISBN-RETRY,1,99999,\n"
+        f"RetryB,2001,ISBN-RETRY,1,{author['id']},\n"
+        f"RetryC,2001,ISBN-RETRY,1,{author['id']},\n"
+        "RetryD,2001,ISBN-RETRY-2,1,99999,\n"
+        f"RetryE,2001,ISBN-RETRY-2,1,{author['id']},\n"
+    )
+    for chunk_size in (10, 1):
+        response = await client.post(
+            "/api/books/import",
+            params={"chunk_size": chunk_size},
+            files={"file": (f"feed-{chunk_size}.csv", feed.replace("RETRY", f"RETRY-{chunk_size}"), "text/csv")}
+        )
+        data = response.json()
+        assert data["imported"] == 2
+        assert [(error["row"], error["detail"].split()[0]) for error in data["errors"]] == [
+            (2, "Author"), (4, "Duplicate"), (5, "Author")
+        ]
+
+@pytest.mark.asyncio
+async def test_import_books_ndjson(client):
+    author = (await client.post("/api/authors/", json=author_payload("Import", "Json"))).json()
+    await client.post("/api/books/", json=book_payload("JsonExisting", "ISBN-JSON-X", 1, [author["id"]]))
+    lines = [
+        json.dumps(book_payload("JsonA", "ISBN-JSON-A", 1, [author["id"]])),
+        json.dumps(book_payload("JsonX", "ISBN-JSON-X", 1, [author["id"]])),
+        "{not json",
+        json.dumps(book_payload("JsonB", "ISBN-JSON-B", 3)),
+    ]
+    response = await client.post(
+        "/api/books/import",
+        params={"format": "ndjson", "chunk_size": 2},
+        files={"file": ("feed.txt", "\n".join(lines), "application/x-ndjson")}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert sorted(error["row"] for error in data["errors"]) == [2, 3]
+
 @pytest.mark.asyncio
 async def test_read_books(client):
     author = (await client.post("/api/authors/", json=author_payload("A", "A"))).json()
@@ -82,6 +153,53 @@ async def test_read_books_pagination(client):
     assert isinstance(response.json(), list)
     assert len(response.json()) <= 2
 
+@pytest.mark.asyncio
+async def test_search_books_fulltext(client):
+    author = (await client.post("/api/authors/", json=author_payload("Zelda", "Marsh"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("Horticulture"))).json()
+    resp = await client.post("/api/books/", json=book_payload("Quantum Gardening", "ISBN-FTS-1", 1, [author["id"]], [category["id"]]))
+    book_id = resp.json()["id"]
+    for q in ("quantum gardening", "Marsh", "horticulture"):
+        response = await client.get("/api/books/search", params={"q": q})
+        assert response.status_code == 200
+        results = response.json()
+        assert [book["id"] for book in results] == [book_id]
+        assert results[0]["rank"] > 0
+
+@pytest.mark.asyncio
+async def test_search_books_follows_author_rename(client):
+    author = (await client.post("/api/authors/", json=author_payload("Old", "Surname"))).json()
+    resp = await client.post("/api/books/", json=book_payload("Renamed Author Book", "ISBN-FTS-2", 1, [author["id"]]))
+    book_id = resp.json()["id"]
+    await client.put(f"/api/authors/{author['id']}", json={"last_name": "Xylander"})
+    results = (await client.get("/api/books/search", params={"q": "Xylander"})).json()
+    assert [book["id"] for book in results] == [book_id]
+    assert (await client.get("/api/books/search", params={"q": "Surname"})).json() == []
+
+@pytest.mark.asyncio
+async def test_read_books_cursor_pagination(client):
+    author = (await client.post("/api/authors/", json=author_payload("Cursor", "Cursor"))).json()
+    created = []
+    for i in range(5):
+        resp = await client.post("/api/books/", json=book_payload(f"Cur{i}", f"ISBN-Cur{i}", 1, [author["id"]]))
+        created.append(resp.json()["id"])
+    seen = []
+    params = {"author_id": author["id"], "limit": 2}
+    while True:
+        response = await client.get("/api/books/", params=params)
+        assert response.status_code == 200
+        seen.extend(book["id"] for book in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+    assert seen == created
+
+@pytest.mark.asyncio
+async def test_read_books_invalid_cursor(client):
+    response = await client.get("/api/books/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
 @pytest.mark.asyncio
 async def test_read_book_by_id(client):
     author = (await client.post("/api/authors/", json=author_payload("Id", "Test"))).json()
@@ -93,6 +211,98 @@ async def test_read_book_by_id(client):
     data = response.json()
     assert data["id"] == book_id
 
+@pytest.mark.asyncio
+async def test_read_book_expand(client):
+    author = (await client.post("/api/authors/", json=author_payload("Expand", "One"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("ExpandCat"))).json()
+    resp = await client.post("/api/books/", json=book_payload("BookP", "ISBN-P", 1, [author["id"]], [category["id"]]))
+    book_id = resp.json()["id"]
+    plain = (await client.get(f"/api/books/{book_id}")).json()
+    assert "authors" not in plain and "categories" not in plain
+    response = await client.get(f"/api/books/{book_id}", params={"expand": "authors,categories"})
+    assert response.status_code == 200
+    data = response.json()
+    assert [a["id"] for a in data["authors"]] == [author["id"]]
+    assert [c["id"] for c in data["categories"]] == [category["id"]]
+
+@pytest.mark.asyncio
+async def test_read_books_expand_fixed_query_count(client, async_engine):
+    author = (await client.post("/api/authors/", json=author_payload("Expand", "Many"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("ExpandManyCat"))).json()
+    for i in range(4):
+        await client.post("/api/books/", json=book_payload(f"Exp{i}", f"ISBN-Exp{i}", 1, [author["id"]], [category["id"]]))
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = await client.get("/api/books/", params={"author_id": author["id"], "expand": "authors,categories"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    books = response.json()
+    assert len(books) == 4
+    assert all(book["authors"][0]["id"] == author["id"] for book in books)
+    assert len(statements) == 3
+
+@pytest.mark.asyncio
+async def test_read_books_expand_invalid(client):
+    response = await client.get("/api/books/", params={"expand": "borrowers"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_read_book_served_from_cache(client, engine):
+    author = (await client.post("/api/authors/", json=author_payload("Cache", "Hit"))).json()
+    resp = await client.post("/api/books/", json=book_payload("BookS", "ISBN-S", 1, [author["id"]]))
+    book_id = resp.json()["id"]
+    with Session(engine) as first:
+        assert crud_books.get(first, book_id).title == "BookS"
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        with Session(engine) as second:
+            assert crud_books.get(second, book_id).title == "BookS"
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert statements == []
+
+    await client.put(f"/api/books/{book_id}", json={"title": "BookS-Updated"})
+    with Session(engine) as third:
+        assert crud_books.get(third, book_id).title == "BookS-Updated"
+    stats = (await client.get("/api/stats/cache")).json()
+    assert stats["entities"]["book"]["hits"] >= 1
+
+def test_shared_cache_roundtrip():
+    store = LocalSharedStore()
+    cache = SharedCache(store, ttl_seconds=60)
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cache.set("book:1", {"id": 1, "title": "Shared", "created_at": created})
+    assert cache.get("book:1") == {"id": 1, "title": "Shared", "created_at": created}
+    assert json.loads(store.get("library:entity:book:1"))["title"] == "Shared"
+    cache.delete("book:1")
+    assert cache.get("book:1") is None
+
+@pytest.mark.parametrize("cache", [SharedCache(LocalSharedStore(), ttl_seconds=60), LRUCache(ttl_seconds=60)])
+def test_cache_drops_fill_raced_by_invalidation(cache):
+    generation = cache.generation()
+    cache.delete("book:1")
+    cache.set("book:1", {"id": 1, "title": "Stale"}, generation=generation)
+    assert cache.get("book:1") is None
+    cache.set("book:1", {"id": 1, "title": "Fresh"}, generation=cache.generation())
+    assert cache.get("book:1") == {"id": 1, "title": "Fresh"}
+
+def test_lru_cache_evicts_oldest():
+    cache = LRUCache(maxsize=2, ttl_seconds=60)
+    cache.set("a", {"id": 1})
+    cache.set("b", {"id": 2})
+    cache.get("a")
+    cache.set("c", {"id": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"id": 1}
+    assert cache.info()["evictions"] == 1
+
 @pytest.mark.asyncio
 async def test_read_book_not_found(client):
     response = await client.get("/api/books/99999")
@@ -113,6 +323,45 @@ async def test_update_book(client):
     assert response.status_code == 200
     assert response.json()["title"] == "BookG-Updated"
 
+@pytest.mark.asyncio
+async def test_update_book_keeps_relations_when_omitted(client):
+    author = (await client.post("/api/authors/", json=author_payload("Keep", "Links"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("KeepCat"))).json()
+    resp = await client.post("/api/books/", json=book_payload("BookN", "ISBN-N", 1, [author["id"]], [category["id"]]))
+    book_id = resp.json()["id"]
+    response = await client.put(f"/api/books/{book_id}", json={"title": "BookN-Updated"})
+    assert response.status_code == 200
+    books = (await client.get("/api/books/", params={"author_id": author["id"]})).json()
+    assert [book["id"] for book in books] == [book_id]
+
+@pytest.mark.asyncio
+async def test_update_book_relations(client):
+    first = (await client.post("/api/authors/", json=author_payload("Swap", "First"))).json()
+    second = (await client.post("/api/authors/", json=author_payload("Swap", "Second"))).json()
+    resp = await client.post("/api/books/", json=book_payload("BookO", "ISBN-O", 1, [first["id"]]))
+    book_id = resp.json()["id"]
+    response = await client.put(f"/api/books/{book_id}", json={"author_ids": [second["id"]]})
+    assert response.status_code == 200
+    assert (await client.get("/api/books/", params={"author_id": first["id"]})).json() == []
+    books = (await client.get("/api/books/", params={"author_id": second["id"]})).json()
+    assert [book["id"] for book in books] == [book_id]
+
+@pytest.mark.asyncio
+async def test_update_book_duplicate_isbn(client):
+    author = (await client.post("/api/authors/", json=author_payload("UpdIsbn", "Book"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("UpdIsbnCat"))).json()
+    await client.post("/api/books/", json=book_payload("BookL", "ISBN-L", 1, [author["id"]], [category["id"]]))
+    resp = await client.post("/api/books/", json=book_payload("BookM", "ISBN-M", 1, [author["id"]], [category["id"]]))
+    book_id = resp.json()["id"]
+    response = await client.put(f"/api/books/{book_id}", json={"isbn": "ISBN-L"})
+    assert response.status_code == 400
+
+def test_isbn_filter_has_no_false_negatives():
+    isbn_filter = ISBNFilter(capacity=1000)
+    isbns = [f"ISBN-F{i}" for i in range(1000)]
+    isbn_filter.update(isbns)
+    assert all(isbn in isbn_filter for isbn in isbns)
+
 @pytest.mark.asyncio
 async def test_update_book_not_found(client):
     response = await client.put("/api/books/99999", json={"title": "Nope"})
@@ -160,6 +409,19 @@ async def test_delete_book_with_active_borrows(client):
     response = await client.delete(f"/api/books/{book_id}")
     assert response.status_code == 400
 
+@pytest.mark.asyncio
+async def test_delete_book_after_return(client):
+    author = (await client.post("/api/authors/", json=author_payload("Returned", "Book"))).json()
+    category = (await client.post("/api/categories/", json=category_payload("ReturnedCat"))).json()
+    resp = await client.post("/api/books/", json=book_payload("BookR", "ISBN-R", 1, [author["id"]], [category["id"]]))
+    book_id = resp.json()["id"]
+    user = (await client.post("/api/users/", json=user_payload("Returner", "Test", "returner@bookr.com", "testpass123"))).json()
+    borrowed = (await client.post("/api/borrowed_books/", json={"user_id": user["id"], "book_id": book_id})).json()
+    await client.put(f"/api/borrowed_books/{borrowed['id']}", json={})
+    # Only open loans block the delete, returned ones go with the book
+    response = await client.delete(f"/api/books/{book_id}")
+    assert response.status_code == 200
+
 @pytest.mark.asyncio
 async def test_check_book_availability(client):
     author = (await client.post("/api/authors/", json=author_payload("Avail", "Book"))).json()
@@ -174,6 +436,38 @@ async def test_check_book_availability(client):
     assert data["available_copies"] == 2
     assert data["is_available"] is True
 
+@pytest.mark.asyncio
+async def test_check_book_availability_bypasses_cache(client, engine):
+    author = (await client.post("/api/authors/", json=author_payload("Live", "Avail"))).json()
+    book_id = (await client.post("/api/books/", json=book_payload("BookLive", "ISBN-LIVE", 2, [author["id"]]))).json()["id"]
+    assert (await client.get(f"/api/books/{book_id}")).status_code == 200
+    # A borrow recorded by another worker leaves this process' cache entry untouched
+    with Session(engine) as db:
+        db.execute(update(Book).where(Book.id == book_id).values(active_borrow_count=2))
+        db.commit()
+    data = (await client.get(f"/api/books/{book_id}/available")).json()
+    assert data["available_copies"] == 0
+    assert data["is_available"] is False
+
+@pytest.mark.asyncio
+async def test_check_books_availability_batch(client):
+    author = (await client.post("/api/authors/", json=author_payload("Batch", "Avail"))).json()
+    first = (await client.post("/api/books/", json=book_payload("BookQ", "ISBN-Q", 2, [author["id"]]))).json()
+    second = (await client.post("/api/books/", json=book_payload("BookR", "ISBN-R", 1, [author["id"]]))).json()
+    user = (await client.post("/api/users/", json=user_payload("Batch", "Test", "batch@bookq.com", "testpass123"))).json()
+    await client.post("/api/borrowed_books/", json={"user_id": user["id"], "book_id": second["id"]})
+    response = await client.post("/api/books/availability", json={"book_ids": [second["id"], 99999, first["id"]]})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"book_id": second["id"], "total_copies": 1, "available_copies": 0, "is_available": False},
+        {"book_id": first["id"], "total_copies": 2, "available_copies": 2, "is_available": True},
+    ]
+
+@pytest.mark.asyncio
+async def test_check_books_availability_batch_empty(client):
+    response = await client.post("/api/books/availability", json={"book_ids": []})
+    assert response.status_code == 422
+
 @pytest.mark.asyncio
 async def test_check_book_availability_not_found(client):
     response = await client.get("/api/books/99999/available")
@@ -1,6 +1,19 @@
 import pytest
 from datetime import datetime, timedelta, timezone
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from sqlmodel import Session
+from app.crud.borrowed_books import crud_borrowed
+from app.models.books import Book, BookService
+from app.models.borrowed_books import BorrowedBookCreate
+from app.models.users import User
+from app.utils.exceptions import LibraryException
+from app.config import get_settings
+from app.services.borrow_benchmark import run_benchmark
+from app.services import index_benchmark
+from app.services.fines import assess_fines, compute_fines, get_overdue
+import numpy as np
 
 def author_payload(first_name="BorrowerAuthor", last_name="Test", biography="Bio"):
     return {
@@ -137,6 +150,30 @@ async def test_update_borrowed(client):
     assert response.status_code == 200
     assert response.json()["real_return_date"] is not None
 
+@pytest.mark.asyncio
+async def test_return_restores_availability(client):
+    user_id = await create_user(client, "borrowed11@test.com", "testpass123")
+    book_id = await create_book(client, "Book11")
+    resp = await client.post("/api/borrowed_books/", json=borrowed_payload(user_id, book_id))
+    borrowed_id = resp.json()["id"]
+    assert (await client.get(f"/api/books/{book_id}/available")).json()["available_copies"] == 0
+    await client.put(f"/api/borrowed_books/{borrowed_id}", json={})
+    await client.put(f"/api/borrowed_books/{borrowed_id}", json={})
+    assert (await client.get(f"/api/books/{book_id}/available")).json()["available_copies"] == 1
+
+@pytest.mark.asyncio
+async def test_reconcile_borrow_counts(client, session):
+    user_id = await create_user(client, "borrowed12@test.com", "testpass123")
+    book_id = await create_book(client, "Book12")
+    await client.post("/api/borrowed_books/", json=borrowed_payload(user_id, book_id))
+    book = session.get(Book, book_id)
+    book.active_borrow_count = 7
+    session.add(book)
+    session.commit()
+    assert BookService().reconcile_borrow_counts(session) >= 1
+    session.refresh(book)
+    assert book.active_borrow_count == 1
+
 @pytest.mark.asyncio
 async def test_update_borrowed_not_found(client):
     response = await client.put("/api/borrowed_books/99999", json={})
@@ -160,6 +197,7 @@ async def test_delete_borrowed(client):
     borrowed_id = resp.json()["id"]
     response = await client.delete(f"/api/borrowed_books/{borrowed_id}")
     assert response.status_code == 200
+    assert (await client.get(f"/api/books/{book_id}/available")).json()["available_copies"] == 1
 
 @pytest.mark.asyncio
 async def test_delete_borrowed_not_found(client):
@@ -174,4 +212,182 @@ async def test_delete_borrowed_twice(client):
     borrowed_id = resp.json()["id"]
     await client.delete(f"/api/borrowed_books/{borrowed_id}")
     response = await client.delete(f"/api/borrowed_books/{borrowed_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_borrow_rejected_without_copies(client):
+    first = await create_user(client, "nocopies1@test.com", "testpass123")
+    second = await create_user(client, "nocopies2@test.com", "testpass123")
+    book_id = await create_book(client, "SingleCopy")
+    assert (await client.post("/api/borrowed_books/", json=borrowed_payload(first, book_id))).status_code == 201
+    response = await client.post("/api/borrowed_books/", json=borrowed_payload(second, book_id))
+    assert response.status_code == 409
+    available = (await client.get(f"/api/books/{book_id}/available")).json()
+    assert available["available_copies"] == 0
+
+@pytest.mark.asyncio
+async def test_borrow_limit_per_user(client):
+    user_id = await create_user(client, "limit@test.com", "testpass123")
+    limit = get_settings().MAX_BORROWS_PER_USER
+    book_ids = [await create_book(client, f"LimitBook{i}") for i in range(limit + 1)]
+    for book_id in book_ids[:limit]:
+        assert (await client.post("/api/borrowed_books/", json=borrowed_payload(user_id, book_id))).status_code == 201
+    response = await client.post("/api/borrowed_books/", json=borrowed_payload(user_id, book_ids[-1]))
+    assert response.status_code == 409
+    # The rejected borrow must not have consumed the book's only copy
+    available = (await client.get(f"/api/books/{book_ids[-1]}/available")).json()
+    assert available["available_copies"] == 1
+
+def test_concurrent_borrowers_on_one_title(engine):
+    result = run_benchmark(engine, borrowers=120, copies=25, workers=12)
+    assert result["granted"] == 25
+    assert result["correct"]
+
+
+@pytest.mark.parametrize("operations", [("return",) * 4, ("return", "remove", "return", "remove")])
+def test_concurrent_returns_of_one_loan(engine, operations):
+    run_id = uuid.uuid4().hex[:8]
+    with Session(engine) as db:
+        book = Book(title=f"Double return {run_id}", isbn=f"DOUBLE-{run_id}", quantity=1, publication_year=2000)
+        user = User(first_name="Double", last_name="Return", email=f"double-{run_id}@test.com", hashed_password="!")
+        db.add_all([book, user])
+        db.commit()
+        book_id, user_id = book.id, user.id
+        loan_id = crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id)).id
+
+    barrier = Barrier(len(operations))
+
+    def run(operation):
+        with Session(engine) as db:
+            barrier.wait()
+            try:
+                if operation == "return":
+                    crud_borrowed.return_book(db, loan_id)
+                else:
+                    crud_borrowed.remove(db, id=loan_id)
+            except LibraryException:
+                pass
+
+    with ThreadPoolExecutor(max_workers=len(operations)) as executor:
+        list(executor.map(run, operations))
+
+    with Session(engine) as db:
+        assert db.get(Book, book_id).active_borrow_count == 0
+        assert db.get(User, user_id).active_borrow_count == 0
+        # The copy goes out exactly once more
+        crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id))
+        with pytest.raises(LibraryException):
+            crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id))
+
+
+def test_borrow_queries_use_indexes(engine):
+    result = index_benchmark.run_benchmark(engine, loans=20000, users=200, books=50)
+    plans = {name: "\n".join(query["after"]["plan"]) for name, query in result["queries"].items()}
+    assert "ix_borrowed_book_book_id_real_return_date" in plans["open_loans_of_book"]
+    assert "ix_borrowed_book_user_id_borrowed_date" in plans["recent_loans_of_user"]
+    assert "ix_borrowed_book_open_due_date" in plans["overdue_loans"]
+    assert all("ix_borrowed_book" not in "\n".join(query["before"]["plan"]) for query in result["queries"].values())
+
+
+@pytest.mark.asyncio
+async def test_overdue_pages_longest_overdue_first(client):
+    user_id = await create_user(client, "overdue-pages@test.com", "testpass123")
+    now = datetime.now(timezone.utc)
+    # The two 25-day loans share a due date, the id breaks the tie
+    borrowed = {days: (now - timedelta(days=days)).isoformat() for days in (25, 30, 40)}
+    ids = []
+    for i, days in enumerate((40, 25, 30, 25)):
+        book_id = await create_book(client, f"OverduePage{i}")
+        payload = {"user_id": user_id, "book_id": book_id, "borrowed_date": borrowed[days]}
+        ids.append((await client.post("/api/borrowed_books/", json=payload)).json()["id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"user_id": user_id, "limit": 3, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/borrowed_books/overdue", params=params)
+        seen += [loan["id"] for loan in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [ids[0], ids[2], ids[1], ids[3]]
+
+
+def test_borrow_stores_due_date_of_loan_period(engine, monkeypatch):
+    monkeypatch.setattr(get_settings(), "BORROW_DURATION_DAYS", 21)
+    run_id = uuid.uuid4().hex[:8]
+    with Session(engine) as db:
+        book = Book(title=f"Loan period {run_id}", isbn=f"PERIOD-{run_id}", quantity=1, publication_year=2000)
+        user = User(first_name="Loan", last_name="Period", email=f"period-{run_id}@test.com", hashed_password="!")
+        db.add_all([book, user])
+        db.commit()
+        borrowed_date = datetime.now(timezone.utc) - timedelta(days=30)
+        loan = crud_borrowed.create(
+            db, obj_in=BorrowedBookCreate(user_id=user.id, book_id=book.id, borrowed_date=borrowed_date)
+        )
+        assert loan.return_date == (borrowed_date + timedelta(days=21)).replace(tzinfo=None)
+
+        overdue = get_overdue(db, user_id=user.id)
+        assert [(item.id, item.days_overdue) for item in overdue] == [(loan.id, 9)]
+
+
+def test_compute_fines_vectorized():
+    day = 86400
+    borrowed_at = np.array([0.0, 0.0, 0.0])
+    return_by = np.array([np.nan, 3 * day, 30 * day])
+    due, days_overdue, fines = compute_fines(borrowed_at, return_by, 20.5 * day, duration_days=14, rate=0.5)
+    assert due.tolist() == [14 * day, 3 * day, 30 * day]
+    assert days_overdue.tolist() == [6, 17, 0]
+    assert fines.tolist() == [3.0, 8.5, 0.0]
+
+@pytest.mark.asyncio
+async def test_overdue_and_fines(client, session):
+    user_id = await create_user(client, "overdue@test.com", "testpass123")
+    book_id = await create_book(client, "OverdueBook")
+    now = datetime.now(timezone.utc)
+    payload = {
+        "user_id": user_id,
+        "book_id": book_id,
+        "borrowed_date": (now - timedelta(days=30)).isoformat(),
+        "return_date": (now - timedelta(days=20)).isoformat(),
+    }
+    borrowed_id = (await client.post("/api/borrowed_books/", json=payload)).json()["id"]
+
+    overdue = (await client.get("/api/borrowed_books/overdue", params={"user_id": user_id})).json()
+    assert [loan["id"] for loan in overdue] == [borrowed_id]
+    assert overdue[0]["due_date"].startswith(payload["return_date"][:19])
+    assert overdue[0]["days_overdue"] == 20
+    assert overdue[0]["fine"] == 20 * get_settings().OVERDUE_FINE_RATE
+
+    report = assess_fines(session, chunk_size=2)
+    assert report.overdue >= 1
+    totals = (await client.get("/api/borrowed_books/fines", params={"user_id": user_id})).json()
+    assert totals == [{"user_id": user_id, "loans": 1, "total_fines": 20 * get_settings().OVERDUE_FINE_RATE}]
+
+    # Returned loans drop out of the overdue list but keep their ledger entry
+    await client.put(f"/api/borrowed_books/{borrowed_id}", json={})
+    overdue = (await client.get("/api/borrowed_books/overdue", params={"user_id": user_id})).json()
+    assert overdue == []
+    totals = (await client.get("/api/borrowed_books/fines", params={"user_id": user_id})).json()
+    assert totals[0]["total_fines"] == 20 * get_settings().OVERDUE_FINE_RATE
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("assessed_days_ago", [None, 5])
+async def test_late_return_settles_fine(client, session, assessed_days_ago):
+    email = f"late-{assessed_days_ago}@test.com"
+    user_id = await create_user(client, email, "testpass123")
+    book_id = await create_book(client, f"LateBook{assessed_days_ago}")
+    now = datetime.now(timezone.utc)
+    payload = {
+        "user_id": user_id,
+        "book_id": book_id,
+        "borrowed_date": (now - timedelta(days=30)).isoformat(),
+        "return_date": (now - timedelta(days=20)).isoformat(),
+    }
+    borrowed_id = (await client.post("/api/borrowed_books/", json=payload)).json()["id"]
+    if assessed_days_ago is not None:
+        # The last nightly run saw the loan 5 days less overdue
+        assess_fines(session, as_of=now - timedelta(days=assessed_days_ago))
+
+    await client.put(f"/api/borrowed_books/{borrowed_id}", json={})
+    totals = (await client.get("/api/borrowed_books/fines", params={"user_id": user_id})).json()
+    assert totals == [{"user_id": user_id, "loans": 1, "total_fines": 20 * get_settings().OVERDUE_FINE_RATE}]
@@ -0,0 +1,16 @@
+import pytest
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_templates(client):
+    await client.get("/api/books/")
+    await client.get("/api/books/987654")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/books/{book_id}",status="404"}' in body
+    assert 'route="/api/books/987654"' not in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/books/",status="200"}' in body
+    assert 'http_request_db_queries_total{method="GET",route="/api/books/"}' in body
+    assert "http_requests_in_flight" in body
@@ -0,0 +1,10 @@
+from app.services.query_plans import check_plans
+
+
+def test_query_plans_match_fingerprints_and_budgets(engine):
+    results = check_plans(engine)
+    failures = [
+        f"{result.name}: " + "; ".join(result.problems)
+        for result in results if result.problems
+    ]
+    assert not failures, "\n".join(failures)
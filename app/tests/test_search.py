@@ -0,0 +1,48 @@
+import pytest
+
+def author_payload(first_name="Suggest", last_name="Author", biography="Bio"):
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "biography": biography
+    }
+
+def book_payload(title="Suggest Book", isbn="ISBN-SUGGEST", author_ids=None):
+    return {
+        "title": title,
+        "publication_year": 2020,
+        "isbn": isbn,
+        "quantity": 1,
+        "author_ids": author_ids or [],
+        "category_ids": []
+    }
+
+@pytest.mark.asyncio
+async def test_suggest_titles_by_word_prefix(client):
+    await client.post("/api/books/", json=book_payload("Orchid Cultivation Basics", "ISBN-SUG-1"))
+    await client.post("/api/books/", json=book_payload("Advanced Orchid Cultivation", "ISBN-SUG-2"))
+    response = await client.get("/api/search/suggest", params={"q": "orchid cult"})
+    assert response.status_code == 200
+    data = response.json()
+    titles = [book["label"] for book in data["books"]]
+    assert set(titles) == {"Orchid Cultivation Basics", "Advanced Orchid Cultivation"}
+
+@pytest.mark.asyncio
+async def test_suggest_authors(client):
+    author = (await client.post("/api/authors/", json=author_payload("Ottoline", "Wexford"))).json()
+    response = await client.get("/api/search/suggest", params={"q": "wexf"})
+    assert response.status_code == 200
+    assert [a["id"] for a in response.json()["authors"]] == [author["id"]]
+
+@pytest.mark.asyncio
+async def test_suggest_limit(client):
+    for i in range(3):
+        await client.post("/api/books/", json=book_payload(f"Limitless Title {i}", f"ISBN-SUG-L{i}"))
+    response = await client.get("/api/search/suggest", params={"q": "limitless", "limit": 2})
+    assert response.status_code == 200
+    assert len(response.json()["books"]) == 2
+
+@pytest.mark.asyncio
+async def test_suggest_query_too_short(client):
+    response = await client.get("/api/search/suggest", params={"q": "a"})
+    assert response.status_code == 422
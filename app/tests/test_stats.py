@@ -0,0 +1,215 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+import pytest
+import queue
+import logging
+from sqlalchemy import text
+from sqlmodel import Session, create_engine, select
+from app.crud.books import crud_books
+from app.crud.borrowed_books import crud_borrowed
+from app.config import get_settings
+from app.db import profiler
+from app.db.pool import pool_options, pool_metrics
+from app.models.authors import Author
+from app.models.books import Book
+from app.models.borrowed_books import BorrowedBookCreate
+from app.models.stats import AuthorBorrowStats, BookBorrowDaily
+from app.models.users import User
+from app.services import popularity
+from app.utils.logger import DroppingQueueHandler, flush_logging
+
+@pytest.mark.asyncio
+async def test_pool_stats(client):
+    response = await client.get("/api/stats/pool")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) >= {"sync", "async"}
+    assert {"checked_out", "idle", "overflow", "wait_ms_buckets"} <= set(data["sync"])
+
+def test_pool_checkout_is_measured():
+    engine = create_engine(os.getenv("DATABASE_TEST_URL"), **pool_options("test", get_settings()))
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert pool_metrics["test"].snapshot()["checked_out"] == 1
+        snapshot = pool_metrics["test"].snapshot()
+        assert snapshot["checkouts"] == 1
+        assert snapshot["checked_out"] == 0
+        assert snapshot["wait_ms_buckets"]["+Inf"] == 1
+    finally:
+        engine.dispose()
+        pool_metrics.pop("test", None)
+
+@pytest.mark.asyncio
+async def test_cache_stats(client):
+    response = await client.get("/api/stats/cache")
+    assert response.status_code == 200
+    assert "book" in response.json()["entities"]
+
+@pytest.mark.asyncio
+async def test_server_timing_counts_queries(client):
+    response = await client.get("/api/books/")
+    assert response.status_code == 200
+    db_timing = response.headers["Server-Timing"].split(",")[0]
+    assert db_timing.startswith("db;dur=")
+    assert 'desc="0 queries"' not in db_timing
+
+def test_slow_query_log(session, monkeypatch):
+    monkeypatch.setattr(profiler.settings, "SLOW_QUERY_THRESHOLD_MS", 0)
+    profile = profiler.start_profile()
+    session.exec(text("SELECT :marker"), params={"marker": "slow-query-marker"})
+    assert profile.count == 1
+    flush_logging()
+    with open(os.path.join(os.environ.get("LOG_DIR", "logs"), "slow_queries.log")) as log:
+        assert "slow-query-marker" in log.read()
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.LogRecord("library_api", logging.INFO, __file__, 0, "message %s", ("lazy",), None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().args == ("lazy",)
+
+@pytest.mark.asyncio
+async def test_logging_stats(client):
+    response = await client.get("/api/stats/logging")
+    assert response.status_code == 200
+    assert response.json()["library_api"]["dropped"] == 0
+
+async def _borrow(client, user_id, book_id):
+    response = await client.post(
+        "/api/borrowed_books/",
+        json={"user_id": user_id, "book_id": book_id, "return_date": "2099-01-01T00:00:00+00:00"}
+    )
+    assert response.status_code == 201
+    return response.json()["id"]
+
+def _counts(rows, key):
+    return {row[key]: row["borrow_count"] for row in rows}
+
+@pytest.mark.asyncio
+async def test_popularity_rollups(client, session):
+    author = (await client.post("/api/authors/", json={"first_name": "Rollup", "last_name": "Author"})).json()
+    other = (await client.post("/api/authors/", json={"first_name": "Rollup", "last_name": "Other"})).json()
+    category = (await client.post("/api/categories/", json={"name": "RollupCategory"})).json()
+    book = (await client.post("/api/books/", json={
+        "title": "Rollup Book", "publication_year": 2020, "isbn": "ROLLUP-1", "quantity": 3,
+        "author_ids": [author["id"]], "category_ids": [category["id"]]
+    })).json()
+    user = (await client.post("/api/users/", json={
+        "first_name": "Rollup", "last_name": "User", "email": "rollup@test.com", "password": "testpass123"
+    })).json()
+
+    borrowed_id = await _borrow(client, user["id"], book["id"])
+    await _borrow(client, user["id"], book["id"])
+    await _borrow(client, user["id"], book["id"])
+    await client.delete(f"/api/borrowed_books/{borrowed_id}")
+
+    books = _counts((await client.get("/api/stats/popular-books?limit=100")).json(), "book")
+    authors = _counts((await client.get("/api/stats/popular-authors?limit=100")).json(), "author")
+    categories = _counts((await client.get("/api/stats/popular-categories?limit=100")).json(), "category")
+    assert books["Rollup Book"] == 2
+    assert authors["Rollup Author"] == 2
+    assert categories["RollupCategory"] == 2
+
+    # Relinking the book moves its borrows to the new author
+    await client.put(f"/api/books/{book['id']}", json={"author_ids": [other["id"]]})
+    authors = _counts((await client.get("/api/stats/popular-authors?limit=100")).json(), "author")
+    assert "Rollup Author" not in authors
+    assert authors["Rollup Other"] == 2
+
+    before = [
+        (await client.get(f"/api/stats/popular-{kind}?limit=1000")).json()
+        for kind in ("books", "authors", "categories")
+    ]
+    popularity.rebuild_rollups(session)
+    after = [
+        (await client.get(f"/api/stats/popular-{kind}?limit=1000")).json()
+        for kind in ("books", "authors", "categories")
+    ]
+    assert [sorted(map(str, rows)) for rows in after] == [sorted(map(str, rows)) for rows in before]
+
+def test_borrow_during_relink_credits_new_author(engine):
+    run_id = uuid.uuid4().hex[:8]
+    with Session(engine) as db:
+        old, new = Author(first_name="Relink", last_name="Old"), Author(first_name="Relink", last_name="New")
+        user = User(first_name="Relink", last_name="User", email=f"relink-{run_id}@test.com", hashed_password="!")
+        book = Book(title=f"Relink {run_id}", isbn=f"RELINK-{run_id}", quantity=5, publication_year=2000)
+        db.add_all([old, new, user, book])
+        db.flush()
+        crud_books._set_authors(db, book, [old.id], existing=set())
+        db.commit()
+        old_id, new_id, user_id, book_id = old.id, new.id, user.id, book.id
+        crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id))
+
+    def borrow():
+        with Session(engine) as db:
+            crud_borrowed.create(db, obj_in=BorrowedBookCreate(user_id=user_id, book_id=book_id))
+
+    with Session(engine) as relink, ThreadPoolExecutor(max_workers=1) as executor:
+        crud_books._set_authors(relink, relink.get(Book, book_id), [new_id])
+        # The borrow starts while the relink is uncommitted and has to wait for it
+        borrowed = executor.submit(borrow)
+        time.sleep(0.5)
+        relink.commit()
+        borrowed.result()
+
+    with Session(engine) as db:
+        assert db.get(AuthorBorrowStats, old_id).borrow_count == 0
+        assert db.get(AuthorBorrowStats, new_id).borrow_count == 2
+
+@pytest.mark.asyncio
+async def test_borrow_day_is_utc(client, session):
+    book = (await client.post("/api/books/", json={
+        "title": "Offset Book", "publication_year": 2020, "isbn": "OFFSET-1", "quantity": 2, "author_ids": []
+    })).json()
+    user = (await client.post("/api/users/", json={
+        "first_name": "Offset", "last_name": "User", "email": "offset@test.com", "password": "testpass123"
+    })).json()
+    # 22:00 UTC on the 17th, the 18th in the client's zone
+    response = await client.post("/api/borrowed_books/", json={
+        "user_id": user["id"], "book_id": book["id"], "borrowed_date": "2024-03-18T01:00:00+03:00"
+    })
+    assert response.status_code == 201
+
+    def buckets():
+        statement = select(BookBorrowDaily.day, BookBorrowDaily.borrow_count).where(
+            BookBorrowDaily.book_id == book["id"]
+        )
+        return dict(session.exec(statement.execution_options(populate_existing=True)).all())
+
+    assert buckets() == {date(2024, 3, 17): 1}
+    assert (await client.delete(f"/api/borrowed_books/{response.json()['id']}")).status_code == 200
+    assert buckets() == {date(2024, 3, 17): 0}
+
+@pytest.mark.asyncio
+async def test_windowed_popularity(client):
+    book = (await client.post("/api/books/", json={
+        "title": "Window Book", "publication_year": 2020, "isbn": "WINDOW-1", "quantity": 2, "author_ids": []
+    })).json()
+    user = (await client.post("/api/users/", json={
+        "first_name": "Window", "last_name": "User", "email": "window@test.com", "password": "testpass123"
+    })).json()
+    long_ago = (datetime.now(timezone.utc) - timedelta(days=100)).isoformat()
+    for payload in (
+        {"user_id": user["id"], "book_id": book["id"], "borrowed_date": long_ago},
+        {"user_id": user["id"], "book_id": book["id"]},
+    ):
+        assert (await client.post("/api/borrowed_books/", json=payload)).status_code == 201
+
+    async def window_count(query):
+        rows = (await client.get(f"/api/stats/popular-books?limit=1000&{query}")).json()
+        return _counts(rows, "book").get("Window Book", 0)
+
+    assert await window_count("window=30d") == 1
+    assert await window_count("window=365d") == 2
+    old_day = long_ago[:10]
+    assert await window_count(f"from={old_day}&to={old_day}") == 1
+    assert await window_count("") == 2
+
+    response = await client.get(f"/api/stats/popular-books?window=7d&from={old_day}")
+    assert response.status_code == 400
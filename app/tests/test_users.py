@@ -1,4 +1,13 @@
+import asyncio
+import threading
 import pytest
+from sqlalchemy import event
+from sqlmodel import Session
+from fastapi import HTTPException
+from app.auth import PasswordHasher
+from app.crud.cache import LRUCache
+from app.crud.users import PrincipalCache, crud_users
+from app.models.users import User
 
 def user_payload(email="test@example.com", password="testpass123"):
     return {
@@ -192,4 +201,111 @@ async def test_delete_user_with_borrowed_books(client):
     # Спроба видалити користувача з активною позикою
     response = await client.delete(f"/api/users/{user_id}")
     assert response.status_code == 400
-    assert "borrowed books" in response.json()["detail"]
\ No newline at end of file
+    assert "borrowed books" in response.json()["detail"]
+
+# --- AUTH ---
+@pytest.mark.asyncio
+async def test_login_and_read_me(client):
+    await client.post("/api/users/", json=user_payload("login@test.com", "secret123"))
+    response = await client.post("/api/users/login", data={"username": "login@test.com", "password": "secret123"})
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    me = await client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.status_code == 200
+    assert me.json()["email"] == "login@test.com"
+
+@pytest.mark.asyncio
+async def test_login_wrong_password(client):
+    await client.post("/api/users/", json=user_payload("badlogin@test.com", "secret123"))
+    response = await client.post("/api/users/login", data={"username": "badlogin@test.com", "password": "nope"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_keeps_event_loop_free():
+    hasher = PasswordHasher(max_workers=1, max_queue=0)
+    release = threading.Event()
+    slow = asyncio.ensure_future(hasher.run(release.wait, 5))
+    await asyncio.sleep(0.05)
+
+    # The loop still runs while the worker is busy, extra calls are rejected
+    with pytest.raises(HTTPException) as exc_info:
+        await hasher.run(str, "rejected")
+    assert exc_info.value.status_code == 503
+    assert hasher.stats()["running"] == 1
+
+    release.set()
+    assert await slow is True
+    assert hasher.stats()["rejected"] == 1
+    assert await hasher.run(str, "ok") == "ok"
+
+@pytest.mark.asyncio
+async def test_concurrent_logins(client):
+    await client.post("/api/users/", json=user_payload("burst@test.com", "secret123"))
+    responses = await asyncio.gather(*(
+        client.post("/api/users/login", data={"username": "burst@test.com", "password": "secret123"})
+        for _ in range(5)
+    ))
+    assert all(response.status_code == 200 for response in responses)
+    stats = (await client.get("/api/stats/password-hashing")).json()
+    assert stats["completed"] >= 6
+    assert stats["queued"] == 0
+
+@pytest.mark.asyncio
+async def test_me_served_from_principal_cache(client, async_engine):
+    user_id = (await client.post("/api/users/", json=user_payload("principal@test.com", "secret123"))).json()["id"]
+    token = (await client.post(
+        "/api/users/login", data={"username": "principal@test.com", "password": "secret123"}
+    )).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 200
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        me = await client.get("/api/users/me", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert me.json()["email"] == "principal@test.com"
+    assert statements == []
+
+    # Renames show up on the next request, deactivation cuts the token off
+    await client.put(f"/api/users/{user_id}", json={"first_name": "Renamed"})
+    assert (await client.get("/api/users/me", headers=headers)).json()["first_name"] == "Renamed"
+    await client.put(f"/api/users/{user_id}", json={"is_active": False})
+    # 401 from the revocation, or 400 from the reloaded inactive user when the
+    # token was issued in the same second as the revocation
+    assert (await client.get("/api/users/me", headers=headers)).status_code in (400, 401)
+
+@pytest.mark.asyncio
+async def test_deleted_user_token_revoked(client):
+    user_id = (await client.post("/api/users/", json=user_payload("revoked@test.com", "secret123"))).json()["id"]
+    token = (await client.post(
+        "/api/users/login", data={"username": "revoked@test.com", "password": "secret123"}
+    )).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 200
+    await client.delete(f"/api/users/{user_id}")
+    assert (await client.get("/api/users/me", headers=headers)).status_code == 401
+
+def test_user_cache_excludes_password_hash(engine):
+    with Session(engine) as db:
+        user = User(first_name="Cache", last_name="Secret", email="cache-secret@test.com", hashed_password="not-cached")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+    with Session(engine) as db:
+        crud_users.get(db, user_id)
+    assert "hashed_password" not in crud_users.cache.get(crud_users._cache_key(user_id))
+    with Session(engine) as db:
+        assert crud_users.get(db, user_id).hashed_password == "not-cached"
+
+def test_revocation_spares_tokens_from_the_same_second():
+    cache = PrincipalCache(LRUCache(ttl_seconds=60), LRUCache(ttl_seconds=60))
+    cache.revoke("same-second@test.com")
+    revoked_at = cache.revocations.get("same-second@test.com")["revoked_at"]
+    assert cache.is_revoked("same-second@test.com", revoked_at - 1)
+    assert not cache.is_revoked("same-second@test.com", revoked_at)
+    assert not cache.is_revoked("other@test.com", revoked_at - 1)
@@ -0,0 +1,37 @@
+import hashlib
+import math
+from typing import Iterable
+
+
+class ISBNFilter:
+    """Bloom filter answering "definitely not in the catalogue" for ISBNs.
+
+    A negative answer is always correct, so bulk imports can skip the
+    database probe for new ISBNs and only check the (rare) possible hits.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, isbn: str):
+        digest = hashlib.blake2b(isbn.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, isbn: str) -> None:
+        for pos in self._positions(isbn):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, isbns: Iterable[str]) -> None:
+        for isbn in isbns:
+            self.add(isbn)
+
+    def __contains__(self, isbn: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(isbn))
@@ -1,53 +1,134 @@
+import atexit
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, List, Tuple
 from app.config import get_settings
 
 settings = get_settings()
 
+# Listener and queue handler by logger name, each listener owns a writer thread
+_listeners: Dict[str, Tuple[QueueListener, "DroppingQueueHandler"]] = {}
+_listeners_lock = threading.Lock()
 
-def setup_logging(log_level_str="INFO"):
-    log_level = getattr(logging, log_level_str.upper(), logging.INFO)
 
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread, never blocks the caller.
+
+    Records are queued unformatted, the message is only built by the
+    listener's handlers. When the queue is full the record is dropped
+    and counted instead of stalling the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same-process queue: no need to pre-format or make the record picklable
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _log_dir() -> str:
     # Create logs directory if it doesn't exist
     log_dir = os.environ.get("LOG_DIR", "logs")
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
+    return log_dir
 
-    # Configure logger
-    logger = logging.getLogger("library_api")
 
-    # Clear any existing handlers to prevent duplicates on reloads
-    if logger.handlers:
-        logger.handlers = []
+def _attach_queue(logger: logging.Logger, handlers: List[logging.Handler]) -> logging.Logger:
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
 
-    logger.setLevel(log_level)
+    logger.handlers = [queue_handler]
     logger.propagate = False  # Prevent duplicate logs
 
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_handler.setFormatter(console_formatter)
-
-    # File handler
-    log_file_path = os.path.join(log_dir, "app.log")
-    file_handler = RotatingFileHandler(
-        log_file_path,
-        maxBytes=10485760,  # 10MB
-        backupCount=10
-    )
-    file_handler.setLevel(log_level)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-    )
-    file_handler.setFormatter(file_formatter)
-
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-
+    listener.start()
+    atexit.register(listener.stop)
+    _listeners[logger.name] = (listener, queue_handler)
     return logger
+
+
+def setup_logging(log_level_str=None):
+    log_level = getattr(logging, (log_level_str or settings.LOG_LEVEL).upper(), logging.INFO)
+    logger = logging.getLogger("library_api")
+
+    with _listeners_lock:
+        # Configured once per process, later calls only adjust the level
+        if logger.name in _listeners:
+            logger.setLevel(log_level)
+            return logger
+
+        logger.setLevel(log_level)
+
+        # Console handler
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(log_level)
+        console_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
+        console_handler.setFormatter(console_formatter)
+
+        # File handler
+        log_file_path = os.path.join(_log_dir(), "app.log")
+        file_handler = RotatingFileHandler(
+            log_file_path,
+            maxBytes=10485760,  # 10MB
+            backupCount=10
+        )
+        file_handler.setLevel(log_level)
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
+        )
+        file_handler.setFormatter(file_formatter)
+
+        return _attach_queue(logger, [console_handler, file_handler])
+
+
+def setup_slow_query_logging():
+    logger = logging.getLogger("library_api.slow_queries")
+
+    with _listeners_lock:
+        if logger.name in _listeners:
+            return logger
+
+        logger.setLevel(logging.WARNING)
+
+        file_handler = RotatingFileHandler(
+            os.path.join(_log_dir(), "slow_queries.log"),
+            maxBytes=10485760,  # 10MB
+            backupCount=10
+        )
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+
+        # Keeps statements and parameters out of app.log
+        return _attach_queue(logger, [file_handler])
+
+
+def flush_logging() -> None:
+    """Block until every queued record has been written."""
+    with _listeners_lock:
+        for listener, _ in _listeners.values():
+            listener.stop()
+            listener.start()
+
+
+def logging_stats() -> dict:
+    return {
+        name: {
+            "queued": handler.queue.qsize(),
+            "queue_size": handler.queue.maxsize,
+            "dropped": handler.dropped,
+        }
+        for name, (_, handler) in _listeners.items()
+    }
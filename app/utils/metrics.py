@@ -0,0 +1,76 @@
+# app/utils/metrics.py
+import os
+import re
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from starlette.requests import Request
+
+# With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+# writable directory shared by all of them (wiped before startup); every
+# worker then writes its samples there and /metrics aggregates them
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+PATH_PARAM = re.compile(r"{(\w+)(:\w+)?}")
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["route", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ["method"],
+    multiprocess_mode="livesum"
+)
+DB_QUERIES = Counter(
+    "http_request_db_queries_total", "SQL statements executed while handling requests", ["route", "method"]
+)
+DB_DURATION = Counter(
+    "http_request_db_duration_seconds_total", "Time spent in SQL statements while handling requests",
+    ["route", "method"]
+)
+
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route, so /api/books/1 and /api/books/2 share a label."""
+    route_path = getattr(request.scope.get("route"), "path", None)
+    if route_path is None:
+        return UNMATCHED_ROUTE
+    # Depending on the FastAPI version route.path may lack the include_router
+    # prefix, recover it from the part of the request path the route did not match
+    path_params = request.scope.get("path_params", {})
+    rendered = PATH_PARAM.sub(lambda m: str(path_params.get(m.group(1), m.group(0))), route_path)
+    path = request.scope["path"]
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + route_path
+    return route_path
+
+
+def observe_request(request: Request, status: int, duration: float, profile) -> None:
+    route = route_template(request)
+    labels = (route, request.method, str(status))
+    REQUESTS.labels(*labels).inc()
+    REQUEST_LATENCY.labels(*labels).observe(duration)
+    DB_QUERIES.labels(route, request.method).inc(profile.count)
+    DB_DURATION.labels(route, request.method).inc(profile.duration)
+
+
+def mark_worker_dead() -> None:
+    # Drops this worker's live gauge samples (in-flight) from the aggregate
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def render_metrics() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
@@ -0,0 +1,72 @@
+import base64
+import json
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from fastapi import Response, status
+from sqlalchemy import tuple_
+
+from app.utils.exceptions import LibraryException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int, sort_key: Optional[str] = None) -> str:
+    fields = {"id": last_id} if sort_key is None else {"key": sort_key, "id": last_id}
+    payload = json.dumps(fields, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def _decode_fields(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        fields = json.loads(base64.urlsafe_b64decode(padded))
+        fields["id"] = int(fields["id"])
+        return fields
+    except (ValueError, KeyError, TypeError):
+        raise LibraryException("Invalid cursor", status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def decode_cursor(cursor: str) -> int:
+    return _decode_fields(cursor)["id"]
+
+
+def decode_sorted_cursor(cursor: str, parse_key: Callable[[str], Any]) -> Tuple[Any, int]:
+    fields = _decode_fields(cursor)
+    try:
+        return parse_key(fields["key"]), fields["id"]
+    except (ValueError, KeyError, TypeError):
+        raise LibraryException("Invalid cursor", status_code=status.HTTP_400_BAD_REQUEST)
+
+
+def paginate(statement, id_column, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    # Keyset pagination on an indexed, unique column: "WHERE id > :last"
+    # costs the same on every page, skip/offset is kept for old clients
+    statement = statement.order_by(id_column)
+    if cursor:
+        statement = statement.where(id_column > decode_cursor(cursor))
+    elif skip:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+
+def paginate_sorted(
+        statement, sort_column, id_column, *, parse_key: Callable[[str], Any],
+        skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+):
+    # Keyset on (sort_column, id), for lists ordered by something other than
+    # the id; an index on both columns serves every page
+    statement = statement.order_by(sort_column, id_column)
+    if cursor:
+        last_key, last_id = decode_sorted_cursor(cursor, parse_key)
+        statement = statement.where(tuple_(sort_column, id_column) > tuple_(last_key, last_id))
+    elif skip:
+        statement = statement.offset(skip)
+    return statement.limit(limit)
+
+
+def set_next_cursor(
+        response: Response, items: Sequence, limit: int, sort_key: Optional[Callable[[Any], str]] = None
+) -> None:
+    if items and len(items) >= limit:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.id, sort_key(last) if sort_key else None)